@@ -0,0 +1,181 @@
+"""Accuracy per block and difficulty (and task) across sessions, with Jeffreys intervals.
+
+The same summaries as data-raw/hdf_to_csv.R:
+
+- task is "color" for color cues (circle, triangle), "direction" otherwise
+- difficulty is "hard" for hues in [80, 100] on color trials and directions in
+  [-10, 10] on direction trials, "easy" otherwise
+- trials with hue 90 or direction 0 have no right answer and are left out
+- the interval is the 95% Jeffreys interval, the quantiles of
+  Beta(1/2 + correct, 1/2 + trials - correct)
+
+Rather than regrouping every trial of every session, the number of trials and of
+correct trials are kept for each session and block x difficulty x task cell, along
+with their totals. Adding a session counts its trials and adds them to the totals
+(replacing its previous counts if it was added before), and the summaries are worked
+out from the totals, so updating them after a session does not depend on how many
+sessions came before. The counts are saved as json between runs, and datastores that
+have not changed since they were counted are skipped.
+
+example:
+    python accuracy.py data-raw/*.hdf5 --state accuracy.json -o accuracy
+"""
+
+import argparse
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from scoring import color_cues, read_trials
+
+cells = ['block', 'difficulty', 'task']
+hard_hues = (80, 100)
+hard_directions = (-10, 10)
+level = 0.95
+
+
+def derive(d: pd.DataFrame) -> pd.DataFrame:
+    """Add task, difficulty and correct (NaN where there is no right answer)."""
+    is_color = np.isin(d['shape'].to_numpy(), color_cues)
+    hue = d['hue'].to_numpy(dtype=float)
+    direction = d['direction'].to_numpy(dtype=float)
+    hard = ((is_color & (hue >= hard_hues[0]) & (hue <= hard_hues[1]))
+        | (~is_color & (direction >= hard_directions[0]) & (direction <= hard_directions[1])))
+    # correct is stored as text by iohub ("True", "False", "None")
+    correct = (~np.isnan(d['response_time'].to_numpy(dtype=float))
+        & (np.char.find(d['correct'].to_numpy().astype(str), 'True') >= 0))
+    return d.assign(
+        task = np.where(is_color, 'color', 'direction'),
+        difficulty = np.where(hard, 'hard', 'easy'),
+        correct = np.where((hue == 90) | (direction == 0), np.nan, correct))
+
+
+def count(d: pd.DataFrame) -> pd.DataFrame:
+    """Trials (n) and correct trials (s) per cell of a table of derived trials."""
+    d = d[~np.isnan(d['correct'].to_numpy(dtype=float))]
+    return (d.groupby(cells)['correct']
+        .agg(s='sum', n='size')
+        .astype(np.int64))
+
+
+def jeffreys(s: np.ndarray, n: np.ndarray, level: float = level) -> pd.DataFrame:
+    from scipy.stats import beta
+
+    s = np.asarray(s, dtype=float)
+    n = np.asarray(n, dtype=float)
+    tail = (1 - level) / 2
+    return pd.DataFrame({
+        'lower': beta.ppf(tail, 0.5 + s, 0.5 + n - s),
+        'upper': beta.ppf(1 - tail, 0.5 + s, 0.5 + n - s)})
+
+
+def empty_counts() -> pd.DataFrame:
+    return pd.DataFrame(
+        {'s': np.empty(0, dtype=np.int64), 'n': np.empty(0, dtype=np.int64)},
+        index=pd.MultiIndex.from_arrays([[], [], []], names=cells))
+
+
+class Accuracy(object):
+    """Running counts of trials and correct trials per session and cell."""
+
+    def __init__(self):
+        self.sessions: Dict[str, pd.DataFrame] = {}
+        self.signatures: Dict[str, List[int]] = {}
+        self.totals = empty_counts()
+
+
+    def add(self, session: str, trials: pd.DataFrame, signature: Optional[List[int]] = None) -> None:
+        """Count a session's trials, replacing what was counted for it before."""
+        counts = count(derive(trials))
+        if session in self.sessions:
+            self.totals = self.totals.sub(self.sessions[session], fill_value=0)
+        self.totals = self.totals.add(counts, fill_value=0).astype(np.int64)
+        self.totals = self.totals[self.totals['n'] > 0].sort_index()
+        self.sessions[session] = counts
+        if signature is not None:
+            self.signatures[session] = signature
+
+
+    def remove(self, session: str) -> None:
+        counts = self.sessions.pop(session)
+        self.signatures.pop(session, None)
+        self.totals = self.totals.sub(counts, fill_value=0).astype(np.int64)
+        self.totals = self.totals[self.totals['n'] > 0]
+
+
+    def summary(self, by: Iterable[str] = ('block', 'difficulty')) -> pd.DataFrame:
+        """N, avg, s and the Jeffreys interval per combination of the by columns."""
+        d = self.totals.groupby(level=list(by)).sum().reset_index()
+        d = d.rename(columns={'n': 'N'})
+        d['avg'] = d['s'] / d['N']
+        d[['lower', 'upper']] = jeffreys(d['s'], d['N']).to_numpy()
+        return d[list(by) + ['N', 'avg', 's', 'lower', 'upper']]
+
+
+    def save(self, path: Union[str, os.PathLike]) -> None:
+        state = {
+            'sessions': {
+                session: {
+                    'signature': self.signatures.get(session),
+                    'counts': counts.reset_index().to_numpy().tolist()}
+                for session, counts in self.sessions.items()},
+            'totals': self.totals.reset_index().to_numpy().tolist()}
+        with open(str(path) + '.tmp', 'w') as f:
+            json.dump(state, f, default=lambda x: x.item())
+        os.replace(str(path) + '.tmp', path)
+
+
+    @classmethod
+    def load(cls, path: Union[str, os.PathLike]) -> 'Accuracy':
+        with open(path) as f:
+            state = json.load(f)
+
+        def counts(rows: List) -> pd.DataFrame:
+            if not rows:
+                return empty_counts()
+            return (pd.DataFrame(rows, columns=cells + ['s', 'n'])
+                .astype({'block': np.int64, 's': np.int64, 'n': np.int64})
+                .set_index(cells))
+
+        accuracy = cls()
+        for session, x in state['sessions'].items():
+            accuracy.sessions[session] = counts(x['counts'])
+            if x['signature'] is not None:
+                accuracy.signatures[session] = x['signature']
+        accuracy.totals = counts(state['totals'])
+        return accuracy
+
+
+def signature(path: Union[str, os.PathLike]) -> List[int]:
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def update(accuracy: Accuracy, datastores: Iterable[Union[str, os.PathLike]]) -> List[str]:
+    """Count the datastores that are new or changed; returns their session names."""
+    updated = []
+    for f in datastores:
+        session = os.path.basename(f)
+        if accuracy.signatures.get(session) == signature(f):
+            continue
+        accuracy.add(session, read_trials(f), signature(f))
+        updated.append(session)
+    return updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("datastores", help="iohub hdf5 files", nargs='+')
+    parser.add_argument("--state", help="json file the counts are kept in between runs", required=True)
+    parser.add_argument("-o", "--out", help="prefix of the csv files to write the summaries to", required=True)
+    args = parser.parse_args()
+
+    accuracy = Accuracy.load(args.state) if os.path.exists(args.state) else Accuracy()
+    updated = update(accuracy, args.datastores)
+    accuracy.save(args.state)
+    accuracy.summary(['block', 'difficulty']).to_csv(f'{args.out}_block_difficulty.csv', index=False)
+    accuracy.summary(['block', 'difficulty', 'task']).to_csv(f'{args.out}_block_difficulty_task.csv', index=False)
+    print(f'{len(updated)} of {len(args.datastores)} sessions counted, {len(accuracy.sessions)} in total')
@@ -0,0 +1,103 @@
+"""Frame times of WrappedDot.draw() for each renderer.
+
+Runs in an ordinary window, so it can be checked on a machine without a GPU
+by using Mesa's software rasterizer, e.g.:
+
+    LIBGL_ALWAYS_SOFTWARE=1 GALLIUM_DRIVER=llvmpipe xvfb-run -s "-screen 0 1920x1080x24" \
+        python benchmarks/draw_dots.py
+
+Blanking is not waited on, and glFinish() is called after every flip, so the
+times are how long the CPU and GPU took to produce each frame.
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from psychopy import visual, monitors
+from psychopy.tools.monitorunittools import deg2pix
+
+from dot import WrappedDot, GL
+from main import Experiment
+
+
+def lab_monitor():
+    """The 'default' monitor, as main.py uses it. Machines other than the lab's
+    (e.g. rendering with llvmpipe) have no calibration for it, so the lab's
+    monitor (a 24" 1920x1080 asus) is assumed there."""
+    mon = monitors.Monitor("default", distance=60.96)
+    if mon.getSizePix() is None:
+        mon.setSizePix((1920, 1080))
+    if mon.getWidth() is None:
+        mon.setWidth(53.1)
+    return mon
+
+
+def time_frames(win, dots, n_frames: int, precompute: bool) -> np.ndarray:
+    times = np.empty(n_frames)
+    if precompute:
+        dots.precomputeTrajectory(n_frames)
+    for frame in range(n_frames):
+        start = timeit.default_timer()
+        dots.draw()
+        win.flip()
+        GL.glFinish()
+        times[frame] = timeit.default_timer() - start
+    return times
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ndots", help="numbers of dots to draw", type=int, nargs='+', default=[100, 1000, 10000, 100000])
+    parser.add_argument("--frames", help="frames per condition", type=int, default=Experiment.n_flips_per_dots)
+    parser.add_argument("--out", help="csv file to write the frame times to", default=None)
+    args = parser.parse_args()
+
+    mon = lab_monitor()
+    win = visual.Window(
+        size=(1920, 1080),
+        fullscr=False,
+        allowGUI=False,
+        winType='pyglet',
+        blendMode='avg',
+        useFBO=True,
+        units="deg",
+        monitor=mon,
+        waitBlanking=False,
+        color='black')
+
+    rows = []
+    print(f"{'renderer':>8} {'precompute':>10} {'ndots':>7} {'median ms':>9} {'p99 ms':>7} {'max ms':>7}")
+    for ndots in args.ndots:
+        for renderer in ['legacy', 'vbo']:
+            dots = WrappedDot(
+                win=win,
+                units='deg',
+                fieldShape="circle",
+                dotSize=deg2pix(Experiment.dotsize_deg, mon),
+                dotLife=-1,
+                coherence=Experiment.dot_coherence,
+                nDots=ndots,
+                fieldSize=Experiment.dotfield_diameter_deg,
+                speed=Experiment.dot_speed_deg_per_sec / Experiment.refresh_rate,
+                renderer=renderer)
+            for precompute in [False, True]:
+                # warm up (shader compilation, buffer creation)
+                time_frames(win, dots, 10, precompute)
+                times = time_frames(win, dots, args.frames, precompute) * 1000
+                print(f"{renderer:>8} {str(precompute):>10} {ndots:>7} {np.median(times):9.3f} "
+                      f"{np.percentile(times, 99):7.3f} {times.max():7.3f}")
+                rows.extend(
+                    (renderer, precompute, ndots, frame, t) for frame, t in enumerate(times))
+
+    win.close()
+
+    if args.out:
+        import pandas as pd
+        (pd.DataFrame(rows, columns=['renderer', 'precompute', 'ndots', 'frame', 'ms'])
+            .to_csv(args.out, index=False))
@@ -0,0 +1,84 @@
+"""Frame times of WrappedDot.draw() with an element, drawing one element per
+dot versus all of the elements at once with an ElementArrayStim.
+
+    python benchmarks/draw_elements.py --ndots 100 400 1600
+
+See draw_dots.py for running this without a GPU.
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from psychopy import visual
+
+from dot import WrappedDot
+from main import Experiment
+from draw_dots import lab_monitor, time_frames
+
+
+element_size_pix = 8
+element_sf = 0.25
+
+
+def make_element(win, batched: bool, ndots: int):
+    if batched:
+        return visual.ElementArrayStim(
+            win, units='pix', nElements=ndots, xys=np.zeros((ndots, 2)),
+            sizes=element_size_pix, sfs=element_sf, elementTex='sin', elementMask='gauss')
+    else:
+        return visual.GratingStim(
+            win, units='pix', size=element_size_pix, sf=element_sf, tex='sin', mask='gauss')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ndots", help="numbers of dots to draw", type=int, nargs='+', default=[25, 100, 400, 1600])
+    parser.add_argument("--frames", help="frames per condition", type=int, default=Experiment.n_flips_per_dots)
+    parser.add_argument("--out", help="csv file to write the frame times to", default=None)
+    args = parser.parse_args()
+
+    mon = lab_monitor()
+    win = visual.Window(
+        size=(1920, 1080),
+        fullscr=False,
+        allowGUI=False,
+        winType='pyglet',
+        blendMode='avg',
+        useFBO=True,
+        units="deg",
+        monitor=mon,
+        waitBlanking=False,
+        color='black')
+
+    rows = []
+    print(f"{'element':>8} {'ndots':>7} {'median ms':>9} {'p99 ms':>7} {'max ms':>7}")
+    for ndots in args.ndots:
+        for batched in [False, True]:
+            dots = WrappedDot(
+                win=win,
+                units='deg',
+                fieldShape="circle",
+                dotLife=-1,
+                coherence=Experiment.dot_coherence,
+                nDots=ndots,
+                fieldSize=Experiment.dotfield_diameter_deg,
+                speed=Experiment.dot_speed_deg_per_sec / Experiment.refresh_rate,
+                element=make_element(win, batched, ndots))
+            label = 'batched' if batched else 'per-dot'
+            time_frames(win, dots, 10, precompute=True)
+            times = time_frames(win, dots, args.frames, precompute=True) * 1000
+            print(f"{label:>8} {ndots:>7} {np.median(times):9.3f} "
+                  f"{np.percentile(times, 99):7.3f} {times.max():7.3f}")
+            rows.extend((label, ndots, frame, t) for frame, t in enumerate(times))
+
+    win.close()
+
+    if args.out:
+        import pandas as pd
+        (pd.DataFrame(rows, columns=['element', 'ndots', 'frame', 'ms'])
+            .to_csv(args.out, index=False))
@@ -0,0 +1,73 @@
+"""Time spent in the frame loop recording each flip, sending an iohub message per
+flip versus writing into a FlipLog, and the cost of flushing the FlipLog once per
+trial (which happens outside of the frame loop).
+
+Starts its own iohub server, without a window, so no display is needed:
+
+    python benchmarks/flip_log.py --trials 20
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from psychopy import core
+from psychopy.iohub.client.connect import launchHubServer
+
+from fliplog import FlipLog
+from main import Experiment
+
+
+def time_per_message(io, n_trials: int, n_flips: int) -> np.ndarray:
+    times = np.empty((n_trials, n_flips))
+    for trial in range(n_trials):
+        for flip in range(n_flips):
+            now = core.getTime()
+            start = timeit.default_timer()
+            io.sendMessageEvent(f'trial-{trial}_flip-{flip}', category="flip", sec_time=now)
+            times[trial, flip] = timeit.default_timer() - start
+    return times
+
+
+def time_flip_log(io, n_trials: int, n_flips: int):
+    flip_log = FlipLog(n_flips)
+    times = np.empty((n_trials, n_flips))
+    flushes = np.empty(n_trials)
+    for trial in range(n_trials):
+        for flip in range(n_flips):
+            now = core.getTime()
+            start = timeit.default_timer()
+            flip_log.record(flip, now)
+            times[trial, flip] = timeit.default_timer() - start
+        start = timeit.default_timer()
+        flip_log.flush(io, 0, trial)
+        flushes[trial] = timeit.default_timer() - start
+    return times, flushes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trials", help="number of trials", type=int, default=20)
+    parser.add_argument("--flips", help="flips per trial", type=int, default=Experiment.n_flips_per_dots)
+    args = parser.parse_args()
+
+    io = launchHubServer()
+    # warm up
+    time_per_message(io, 1, 10)
+    per_message = time_per_message(io, args.trials, args.flips) * 1e6
+    per_flip, flushes = time_flip_log(io, args.trials, args.flips)
+    per_flip *= 1e6
+    flushes *= 1e6
+    io.quit()
+
+    print(f"{'':>12} {'median us':>10} {'p99 us':>8} {'max us':>8} {'per trial us':>13}")
+    for name, t in [('message', per_message), ('flip log', per_flip)]:
+        print(f"{name:>12} {np.median(t):10.2f} {np.percentile(t, 99):8.2f} {t.max():8.2f} "
+              f"{np.median(t.sum(axis=1)):13.1f}")
+    print(f"{'flush':>12} {np.median(flushes):10.2f} {np.percentile(flushes, 99):8.2f} {flushes.max():8.2f} "
+          f"{np.median(flushes):13.1f}")
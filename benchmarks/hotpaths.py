@@ -0,0 +1,253 @@
+"""Time and memory of the experiment's hot paths, saved as json so that runs on
+different commits can be compared.
+
+- kinematics: DotKinematics.step for each noiseDots mode (the part of
+  WrappedDot._update_dotsXY that moves the dots), and newDotsXY for each field shape
+  (WrappedDot._newDotsXY), for nDots from 10^2 to 10^6
+- apertures: moving several fields of dots, one DotKinematics per field (one
+  WrappedDot per aperture) against all of them packed into one (DotFields)
+- prep_df: Experiment.__prep_df, building a subject's trial table
+- colors: psychopy's cielab2rgb and the calibrated conversion, on the palettes of
+  stimuli/colors.py
+- counterbalance: generating one subject's design, and many subjects'
+
+None of these need a window or an OpenGL context. For each case the median time per
+call is recorded, along with the memory allocated during a call that was not freed
+before it returned (retained) and the most memory in use above the start of the call
+(peak), both from tracemalloc, over a separate set of calls.
+
+Moving the dots should not allocate any arrays once it is running: the kinematics
+steps (every noiseDots mode, 'walk' included) and the packed apertures are checked
+for a peak that grows with the number of dots (over 2 KiB, and a byte per dot), and
+the run fails if any has one.
+
+    python benchmarks/hotpaths.py --out before.json
+    python benchmarks/hotpaths.py --out after.json --compare before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+import tracemalloc
+from typing import Callable, Dict, List
+
+import numpy as np
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, os.path.join(root, 'stimuli'))
+
+from kinematics import DotKinematics, newDotsXY
+from main import Experiment
+
+
+def measure(name: str, params: Dict, call: Callable[[], object], repeats: int) -> Dict:
+    call()
+    times = np.empty(repeats)
+    for i in range(repeats):
+        start = timeit.default_timer()
+        call()
+        times[i] = timeit.default_timer() - start
+
+    # tracemalloc slows the calls down, so memory is measured separately
+    n_memory = min(repeats, 10)
+    retained = np.empty(n_memory)
+    peak = np.empty(n_memory)
+    tracemalloc.start()
+    for i in range(n_memory):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        result = call()
+        current, peak_i = tracemalloc.get_traced_memory()
+        del result
+        retained[i] = current - before
+        peak[i] = peak_i - before
+    tracemalloc.stop()
+
+    row = {
+        'bench': name,
+        'params': params,
+        'repeats': repeats,
+        'median_sec': float(np.median(times)),
+        'min_sec': float(times.min()),
+        'retained_bytes': float(np.median(retained)),
+        'peak_bytes': float(np.max(peak))}
+    print(f"{name:>24} {json.dumps(params):<40} {row['median_sec'] * 1e3:10.4f} ms "
+          f"{row['peak_bytes'] / 1024:10.1f} KiB peak")
+    return row
+
+
+def bench_kinematics(ndots: List[int], frames: int) -> List[Dict]:
+    rows = []
+    radius = Experiment.dotfield_diameter_deg / 2
+    speed = Experiment.dot_speed_deg_per_sec / Experiment.refresh_rate
+    for n in ndots:
+        for noiseDots in ['direction', 'position', 'walk']:
+            kinematics = DotKinematics(n)
+            kinematics.xy[:] = newDotsXY(n, 'circle', np.array([radius * 2, radius * 2]))
+            kinematics.dirs[:] = np.random.rand(n) * 2 * np.pi
+            kinematics.nSignal = n // 2
+            kinematics.updateVelocities()
+            rows.append(measure(
+                'kinematics.step', {'nDots': n, 'noiseDots': noiseDots},
+                lambda: kinematics.step(speed, radius, noiseDots), frames))
+        for fieldShape in ['circle', 'sqr']:
+            fieldSize = np.array([radius * 2, radius * 2])
+            rows.append(measure(
+                'newDotsXY', {'nDots': n, 'fieldShape': fieldShape},
+                lambda: newDotsXY(n, fieldShape, fieldSize), max(frames // 10, 5)))
+    return rows
+
+
+def bench_apertures(apertures: List[int], ndots: int, frames: int) -> List[Dict]:
+    rows = []
+    radius = Experiment.dotfield_diameter_deg / 2
+    speed = Experiment.dot_speed_deg_per_sec / Experiment.refresh_rate
+
+    def field(n):
+        kinematics = DotKinematics(n)
+        kinematics.xy[:] = newDotsXY(n, 'circle', np.array([radius * 2, radius * 2]))
+        kinematics.dirs[:] = np.random.rand(n) * 2 * np.pi
+        kinematics.updateVelocities()
+        return kinematics
+
+    for n_apertures in apertures:
+        # the same total number of dots, split between the apertures
+        n = ndots // n_apertures
+        fields = [field(n) for _ in range(n_apertures)]
+        rows.append(measure(
+            'apertures.separate', {'apertures': n_apertures, 'nDots': n * n_apertures},
+            lambda: [f.step(speed, radius) for f in fields], frames))
+        packed = field(n * n_apertures)
+        speeds = np.full((n * n_apertures, 2), speed)
+        radii = np.full(n * n_apertures, radius)
+        rows.append(measure(
+            'apertures.packed', {'apertures': n_apertures, 'nDots': n * n_apertures},
+            lambda: packed.step(speeds, radii), frames))
+    return rows
+
+
+def bench_prep_df(repeats: int) -> List[Dict]:
+    from headless import headless_backend
+
+    experiment = Experiment(sub=1, backend=headless_backend())
+    prep_df = experiment._Experiment__prep_df
+    design = os.path.join('stimuli', 'design.csv')
+    store = os.path.join('stimuli', 'design-store')
+    return [measure('prep_df', {'sub': 1}, lambda: prep_df(design, store), repeats)]
+
+
+def palettes() -> np.ndarray:
+    """Lab of the 8 x 8 palettes drawn by stimuli/colors.py, each 50 x 50."""
+    lumas = np.linspace(80, 100, 8, dtype=float)
+    chromas = np.linspace(0, 20, 8, dtype=float)
+    hues = np.radians(np.linspace(0, 360, 50, endpoint=True))
+    lab = np.empty((len(chromas) * len(lumas), 50, 50, 3))
+    lab[..., 0] = np.tile(lumas, len(chromas))[:, np.newaxis, np.newaxis]
+    lab[..., 1] = np.repeat(chromas, len(lumas))[:, np.newaxis, np.newaxis] * np.cos(hues)
+    lab[..., 2] = np.repeat(chromas, len(lumas))[:, np.newaxis, np.newaxis] * np.sin(hues)
+    return lab
+
+
+def bench_colors(repeats: int) -> List[Dict]:
+    from psychopy.tools import colorspacetools as cst
+
+    from calibration import asus_calibration
+
+    # one conversion per palette, as in colors.py
+    lab = palettes()
+    calibration = asus_calibration()
+    params = {'palettes': len(lab), 'colors': lab.size // 3}
+    return [
+        measure('cielab2rgb', params, lambda: [cst.cielab2rgb(x, clip=True) for x in lab], repeats),
+        measure('lab2rgb_calibrated', params, lambda: [calibration.lab2rgb(x) for x in lab], repeats)]
+
+
+def bench_counterbalance(repeats: int) -> List[Dict]:
+    import counterbalance
+
+    return [
+        measure('subject_design', {'subs': 1}, lambda: counterbalance.subject_design(1), repeats),
+        measure(
+            'stream_designs', {'subs': 1000},
+            lambda: sum(len(d) for d in counterbalance.stream_designs(range(1000))),
+            max(repeats // 10, 3))]
+
+
+def check_allocations(rows: List[Dict]) -> List[Dict]:
+    """Steps of the dots whose peak memory grows with the number of dots."""
+    steps = [r for r in rows if r['bench'] in ('kinematics.step', 'apertures.packed')]
+    # a few hundred bytes of python objects are expected, whatever the number of dots
+    return [r for r in steps if r['peak_bytes'] > max(2048, r['params']['nDots'])]
+
+
+def commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=root, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def compare(rows: List[Dict], path: str) -> None:
+    with open(path) as f:
+        before = {(r['bench'], json.dumps(r['params'])): r for r in json.load(f)['results']}
+    print(f"\n{'':>24} {'':<40} {'time ratio':>10} {'peak ratio':>10}  (vs {path})")
+    for r in rows:
+        b = before.get((r['bench'], json.dumps(r['params'])))
+        if b is None:
+            continue
+        peak = r['peak_bytes'] / b['peak_bytes'] if b['peak_bytes'] else float('nan')
+        print(f"{r['bench']:>24} {json.dumps(r['params']):<40} "
+              f"{r['median_sec'] / b['median_sec']:10.3f} {peak:10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ndots", help="numbers of dots", type=int, nargs='+', default=[10 ** k for k in range(2, 7)])
+    parser.add_argument("--frames", help="frames (calls) per kinematics case", type=int, default=Experiment.n_flips_per_dots)
+    parser.add_argument("--repeats", help="calls per case, for everything else", type=int, default=20)
+    parser.add_argument(
+        "--only", help="benchmarks to run", nargs='+',
+        choices=['kinematics', 'apertures', 'prep_df', 'colors', 'counterbalance'],
+        default=['kinematics', 'apertures', 'prep_df', 'colors', 'counterbalance'])
+    parser.add_argument("--apertures", help="numbers of apertures, sharing --aperture-dots", type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument("--aperture-dots", help="total number of dots of the apertures", type=int, default=Experiment.ndots * 4)
+    parser.add_argument("--out", help="json file to write the results to", default=None)
+    parser.add_argument("--compare", help="json file of an earlier run to compare against", default=None)
+    args = parser.parse_args()
+
+    # prep_df and the colors read files relative to the root of the repo
+    os.chdir(root)
+    rows = []
+    if 'kinematics' in args.only:
+        rows += bench_kinematics(args.ndots, args.frames)
+    if 'apertures' in args.only:
+        rows += bench_apertures(args.apertures, args.aperture_dots, args.frames)
+    if 'prep_df' in args.only:
+        rows += bench_prep_df(args.repeats)
+    if 'colors' in args.only:
+        rows += bench_colors(args.repeats)
+    if 'counterbalance' in args.only:
+        rows += bench_counterbalance(args.repeats)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({
+                'commit': commit(),
+                'machine': platform.platform(),
+                'processor': platform.processor(),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'results': rows}, f, indent=1)
+    if args.compare:
+        compare(rows, args.compare)
+    allocating = check_allocations(rows)
+    for r in allocating:
+        print(f"{r['bench']} {json.dumps(r['params'])} allocates {r['peak_bytes'] / 1024:.1f} KiB per frame")
+    if allocating:
+        sys.exit(1)
@@ -0,0 +1,93 @@
+"""CIELAB -> device rgb using a monitor's measured calibration.
+
+The calibration is the pair of files extracted from the monitor's ICC profile by
+stimuli/extract_profile.m:
+
+- a per-channel tone response curve (TRC), e.g. stimuli/asus-clut.csv: the linear
+  light (0-65535) produced by each of 1024 evenly spaced device values
+- the rgb -> XYZ matrix, e.g. stimuli/asus-rgb2xyz.csv: the XYZ of each primary
+
+Converting a color means going Lab -> XYZ -> linear rgb, then inverting the TRCs to
+find the device values. Both steps are vectorized, so whole grids of colors (e.g.
+stimuli/colors.py palettes) convert in one call. A lookup table is not used: with
+the TRCs inverted before interpolating it is less accurate, and with them inverted
+after it is slower than the exact conversion.
+
+example:
+    python calibration.py --lightness 90 --chroma 15
+"""
+
+import argparse
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from psychopy.tools.colorspacetools import rescaleColor
+
+stimuli = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stimuli')
+
+
+class Calibration(object):
+
+    def __init__(self, clut: str, rgb2xyz: str):
+        trc = pd.read_csv(clut).to_numpy(dtype=float)
+        # enforce monotonic curves, so that they can be inverted
+        self.trc = np.maximum.accumulate(trc, axis=0) / trc.max(axis=0)
+        self.device = np.linspace(0, 1, len(trc))
+        # columns are the primaries
+        self.rgb2xyz = pd.read_csv(rgb2xyz).to_numpy(dtype=float)
+        self.xyz2rgb = np.linalg.inv(self.rgb2xyz)
+        self.whiteXYZ = self.rgb2xyz.sum(axis=1)
+        # identifies the calibration in the names of files derived from it
+        self.digest = hashlib.sha1(self.rgb2xyz.tobytes() + self.trc.tobytes()).hexdigest()[:12]
+
+
+    def lab2linear(self, lab: np.ndarray) -> np.ndarray:
+        """Linear rgb (not clipped, so may be outside of 0-1)."""
+        lab = np.asarray(lab, dtype=float)
+        # Lab -> XYZ, relative to the monitor's white
+        s = (lab[..., 0] + 16.0) / 116.0
+        f = np.stack([s + lab[..., 1] / 500.0, s, s - lab[..., 2] / 200.0], axis=-1)
+        delta = 6.0 / 29.0
+        xyz = np.where(f > delta, f ** 3.0, (f - 4.0 / 29.0) * (3.0 * delta ** 2.0)) * self.whiteXYZ
+
+        return xyz @ self.xyz2rgb.T
+
+
+    def linear2rgb(self, linear: np.ndarray) -> np.ndarray:
+        """psychopy rgb (-1 to 1) of linear rgb. Out of gamut colors are clipped."""
+        linear = np.clip(linear, 0.0, 1.0)
+        device = np.stack(
+            [np.interp(linear[..., gun], self.trc[:, gun], self.device) for gun in range(3)],
+            axis=-1)
+        return rescaleColor(device, convertTo='psychopy')
+
+
+    def lab2rgb(self, lab: np.ndarray) -> np.ndarray:
+        """Exact conversion to psychopy rgb (-1 to 1). Out of gamut colors are clipped."""
+        return self.linear2rgb(self.lab2linear(lab))
+
+
+def asus_calibration() -> Calibration:
+    return Calibration(
+        os.path.join(stimuli, 'asus-clut.csv'),
+        os.path.join(stimuli, 'asus-rgb2xyz.csv'))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lightness", help="lightness of the colors to convert", type=float, default=90.)
+    parser.add_argument("--chroma", help="chroma of the colors to convert", type=float, default=15.)
+    args = parser.parse_args()
+
+    calibration = asus_calibration()
+    hue = np.arange(0, 360, 30)
+    lab = np.stack([
+        np.full(len(hue), args.lightness),
+        args.chroma * np.cos(np.radians(hue)),
+        args.chroma * np.sin(np.radians(hue))], axis=-1)
+    rgb = calibration.lab2rgb(lab)
+    print(f'calibration {calibration.digest}')
+    print(pd.DataFrame({'hue': hue, 'R': rgb[:, 0], 'G': rgb[:, 1], 'B': rgb[:, 2]}).round(4).to_string(index=False))
@@ -0,0 +1,76 @@
+"""CIELCh -> rgb conversions of design colors, kept on disk between sessions.
+
+The design only uses a handful of distinct (lightness, chroma, hue) triples, so each
+one is converted once, stored with the conversion that produced it, and trials are
+mapped onto the stored colors by index.
+"""
+
+import os
+from typing import Callable, Tuple
+
+import numpy as np
+
+from psychopy.tools import colorspacetools as cst
+
+
+def default_lab2rgb(lab: np.ndarray) -> np.ndarray:
+    return cst.cielab2rgb(lab, clip=True)
+
+
+def lch2lab(lch: np.ndarray) -> np.ndarray:
+    lch = np.asarray(lch, dtype=float)
+    hue = np.radians(lch[..., 2])
+    return np.stack(
+        [lch[..., 0], lch[..., 1] * np.cos(hue), lch[..., 1] * np.sin(hue)],
+        axis=-1)
+
+
+class ColorCache(object):
+    """rgb of every (lightness, chroma, hue) triple converted so far.
+
+    Entries are only valid for the conversion named by `key`; a file written with a
+    different key is ignored (and overwritten on the next save).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        lab2rgb: Callable[[np.ndarray], np.ndarray] = default_lab2rgb,
+        key: str = 'cielab2rgb-clip'):
+
+        self.path = path
+        self.lab2rgb = lab2rgb
+        self.key = key
+        self.lch = np.empty((0, 3))
+        self.rgb = np.empty((0, 3))
+        if os.path.exists(path):
+            with np.load(path) as cached:
+                if str(cached['key']) == key:
+                    self.lch = cached['lch']
+                    self.rgb = cached['rgb']
+
+
+    def convert(self, lch: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """rgb of each distinct row of lch, and the index of each row into those colors.
+
+        Colors that are not in the cache yet are converted (in a single call) and the
+        cache file is updated.
+        """
+        unique, index = np.unique(np.asarray(lch, dtype=float), axis=0, return_inverse=True)
+        known = {tuple(x): i for i, x in enumerate(self.lch)}
+        missing = np.array([x for x in unique if tuple(x) not in known]).reshape(-1, 3)
+        if len(missing):
+            self.lch = np.concatenate([self.lch, missing])
+            self.rgb = np.concatenate([self.rgb, self.lab2rgb(lch2lab(missing))])
+            self.save()
+            known = {tuple(x): i for i, x in enumerate(self.lch)}
+        rgb = self.rgb[[known[tuple(x)] for x in unique]]
+        return rgb, index.reshape(-1)
+
+
+    def save(self) -> None:
+        # written next to the cache, then moved over it, so an interrupted save never
+        # leaves a truncated cache behind
+        with open(self.path + '.tmp', 'wb') as f:
+            np.savez(f, key=self.key, lch=self.lch, rgb=self.rgb)
+        os.replace(self.path + '.tmp', self.path)
@@ -0,0 +1,114 @@
+"""Columnar, memory-mapped store of the trial designs of all subjects.
+
+Reading the whole design csv to keep one subject's rows gets slower with every
+subject added, so the designs are converted once into a directory with:
+
+- one .npy file per column, with the rows of each subject contiguous. String
+  columns are stored as integer codes into a list of categories.
+- index.npy: the subjects, and the range of rows each of them occupies.
+- columns.json: the column order, and the categories of the string columns.
+
+Loading a subject memory-maps the columns and reads only that subject's rows, so it
+takes the same time whatever the number of subjects.
+
+example:
+    python designstore.py stimuli/design.csv -o stimuli/design-store
+"""
+
+import argparse
+import json
+import os
+from typing import Iterable, Union
+
+import numpy as np
+import pandas as pd
+
+index_dtype = np.dtype([('sub', np.int64), ('start', np.int64), ('stop', np.int64)])
+
+
+def save(path: str, values: np.ndarray) -> None:
+    """np.save, to a temporary file that is then moved to path, so that path is never
+    left half written (e.g. memory-mapped by a session while the store is rebuilt)."""
+    with open(path + '.tmp', 'wb') as f:
+        np.save(f, values)
+    os.replace(path + '.tmp', path)
+
+
+def build(csvs: Iterable[Union[str, os.PathLike]], directory: Union[str, os.PathLike]) -> None:
+    """Convert design csvs (with a 'sub' column) into a store."""
+    d = pd.concat([pd.read_csv(f) for f in csvs], ignore_index=True)
+    d = d.sort_values(by='sub', kind='stable', ignore_index=True)
+
+    os.makedirs(directory, exist_ok=True)
+    # columns.json is removed first and written last, so that a store that is being
+    # (re)built, or whose build was interrupted, is never loaded
+    manifest = os.path.join(directory, 'columns.json')
+    if os.path.exists(manifest):
+        os.remove(manifest)
+    categories = {}
+    for column in d.columns:
+        values = d[column]
+        if values.dtype == object:
+            codes, uniques = pd.factorize(values, sort=True)
+            categories[column] = uniques.tolist()
+            values = codes.astype(np.int32)
+        save(os.path.join(directory, f'{column}.npy'), np.asarray(values))
+
+    subs, starts = np.unique(d['sub'].to_numpy(), return_index=True)
+    index = np.empty(len(subs), dtype=index_dtype)
+    index['sub'] = subs
+    index['start'] = starts
+    index['stop'] = np.append(starts[1:], len(d))
+    save(os.path.join(directory, 'index.npy'), index)
+    with open(manifest + '.tmp', 'w') as f:
+        json.dump({'columns': d.columns.tolist(), 'categories': categories}, f)
+    os.replace(manifest + '.tmp', manifest)
+
+
+def is_current(directory: Union[str, os.PathLike], csv: Union[str, os.PathLike]) -> bool:
+    """Whether the store exists and was built after the csv was last changed."""
+    manifest = os.path.join(directory, 'columns.json')
+    return os.path.exists(manifest) and os.path.getmtime(manifest) >= os.path.getmtime(csv)
+
+
+class DesignStore(object):
+
+    def __init__(self, directory: Union[str, os.PathLike]):
+        self.directory = directory
+        with open(os.path.join(directory, 'columns.json')) as f:
+            manifest = json.load(f)
+        self.columns = manifest['columns']
+        self.categories = {k: np.array(v, dtype=object) for k, v in manifest['categories'].items()}
+        self.index = np.load(os.path.join(directory, 'index.npy'))
+
+
+    @property
+    def subs(self) -> np.ndarray:
+        return self.index['sub']
+
+
+    def subject(self, sub: int) -> pd.DataFrame:
+        """Rows of one subject, in the order they were in the csv."""
+        i = np.searchsorted(self.index['sub'], sub)
+        if i == len(self.index) or self.index['sub'][i] != sub:
+            raise KeyError(f'no design for subject {sub}')
+        rows = slice(self.index['start'][i], self.index['stop'][i])
+
+        d = {}
+        for column in self.columns:
+            values = np.load(os.path.join(self.directory, f'{column}.npy'), mmap_mode='r')[rows]
+            if column in self.categories:
+                d[column] = self.categories[column][values]
+            else:
+                d[column] = np.array(values)
+        return pd.DataFrame(d, columns=self.columns)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csvs", help="design csv files", nargs='+')
+    parser.add_argument("-o", "--out", help="directory to write the store to", required=True)
+    args = parser.parse_args()
+
+    build(args.csvs, args.out)
+    print(f'{len(DesignStore(args.out).subs)} subjects written to {args.out}')
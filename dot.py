@@ -40,16 +40,63 @@ from psychopy import logging
 # (JWP has no idea why!)
 from psychopy.tools.attributetools import attributeSetter, setAttribute
 from psychopy.tools.arraytools import val2array
+from psychopy.tools.monitorunittools import convertToPix
+from psychopy.tools import gltools
+from psychopy.visual import shaders
 from psychopy.visual.basevisual import (BaseVisualStim, ColorMixin,
                                         ContainerMixin)
 
 import numpy as np
 
+from kinematics import DotKinematics, GlobalRandom, RandomPool, newDotsXY
+
 # some constants
 _piOver2 = np.pi / 2.
 _piOver180 = np.pi / 180.
 _2pi = 2 * np.pi
 
+CPCF = ctypes.POINTER(ctypes.c_float)
+
+# units which are a linear function of pixels, so that positions in them can be
+# converted to pixels by OpenGL (see WrappedDot.playTrajectory)
+_linearUnits = ('pix', 'pixels', 'deg', 'degs', 'cm', 'norm', 'height')
+
+# shader program for the 'vbo' renderer. Vertices are already in pixels (or
+# are converted to them by the modelview matrix), so this only needs to set the size and colour of each point
+_dotsVertSource = '''
+#version 120
+uniform float pointSize;
+uniform float minPointSize;
+
+void main() {
+    gl_Position = gl_ModelViewProjectionMatrix * gl_Vertex;
+    gl_FrontColor = gl_Color;
+    gl_PointSize = max(pointSize, minPointSize);
+}
+'''
+
+
+def minPointSize():
+    """Smallest size (in pixels) that shader points are drawn at, in the current
+    GL context, so that they look like the fixed-function points of the 'legacy'
+    renderer.
+
+    llvmpipe (Mesa's software renderer) does not draw antialiased shader points
+    narrower than 2 pixels at all, while its fixed-function points are 2 pixels
+    wide then, so there points are drawn at least 2 pixels wide. Other drivers draw
+    both at the requested size.
+    """
+    return 2.0 if 'llvmpipe' in gltools.getString(GL.GL_RENDERER) else 0.0
+
+
+_dotsFragSource = '''
+#version 120
+
+void main() {
+    gl_FragColor = gl_Color;
+}
+'''
+
 
 class WrappedDot(BaseVisualStim, ColorMixin, ContainerMixin):
     """This stimulus class defines a field of dots with an update rule that
@@ -100,11 +147,15 @@ class WrappedDot(BaseVisualStim, ColorMixin, ContainerMixin):
         position every frame. For 'direction' noise dots follow a random, but
         constant direction. For 'walk' noise dots vary their direction every
         frame, but keep a constant speed.
+    renderer : str
+        *'legacy'* or 'vbo'. Whether the dots are drawn from client-side vertex
+        arrays or from a vertex buffer object with a shader.
     element : object
         This can be any object that has a ``.draw()`` method and a
         ``.setPos([x,y])`` method (e.g. a GratingStim, TextStim...)!! DotStim
         assumes that the element uses pixels as units. ``None`` defaults to
-        dots.
+        dots. An `ElementArrayStim` with `nDots` elements is drawn in a single
+        call.
     fieldPos : array_like
         Specifying the location of the centre of the stimulus using a
         :ref:`x,y-pair <attrib-xy>`. See e.g. :class:`.ShapeStim` for more
@@ -124,6 +175,9 @@ class WrappedDot(BaseVisualStim, ColorMixin, ContainerMixin):
     speed : float
         Speed of the dots (in *units*/frame). :ref:`operations
         <attrib-operations>` are supported.
+    seed : int or None
+        Seed of the dots' random numbers. Setting it draws a new field of dots,
+        which the same seed reproduces.
 
     """
     def __init__(self,
@@ -147,6 +201,8 @@ class WrappedDot(BaseVisualStim, ColorMixin, ContainerMixin):
                  element=None,
                  signalDots='same',
                  noiseDots='direction',
+                 renderer='legacy',
+                 seed=None,
                  name=None,
                  autoLog=None):
         """
@@ -209,7 +265,8 @@ class WrappedDot(BaseVisualStim, ColorMixin, ContainerMixin):
             This can be any object that has a ``.draw()`` method and a
             ``.setPos([x,y])`` method (e.g. a GratingStim, TextStim...)!!
             DotStim assumes that the element uses pixels as units.
-            ``None`` defaults to dots.
+            ``None`` defaults to dots. If this is an `ElementArrayStim` with
+            `nDots` elements, all of the elements are drawn in a single call.
         signalDots : str
             If 'same' then the signal and noise dots are constant. If different
             then the choice of which is signal and which is noise gets
@@ -223,6 +280,20 @@ class WrappedDot(BaseVisualStim, ColorMixin, ContainerMixin):
             random, but constant direction. For 'walk' noise dots vary their
             direction every frame, but keep a constant speed. This value can be
             set using the `noiseDots` property after initialization.
+        renderer : str
+            How the dots are sent to the graphics card (ignored if `element`
+            is specified). 'legacy' passes the vertices from client memory on
+            every frame. 'vbo' keeps the vertices in a vertex buffer object and
+            draws them with a small shader program; positions precomputed with
+            `precomputeTrajectory()` are uploaded once, in advance, and drawn
+            straight from the buffer.
+        seed : int, optional
+            Seed of the random numbers used for the dots' positions, lives and
+            noise directions, which are then drawn from a
+            `numpy.random.Generator` in large blocks. Setting the `seed`
+            property draws a new field of dots, so a trial's dots can be
+            reproduced from its seed. ``None`` uses the global numpy random
+            state.
         name : str, optional
             Optional name to use for logging.
         autoLog : bool
@@ -237,6 +308,24 @@ class WrappedDot(BaseVisualStim, ColorMixin, ContainerMixin):
         super().__init__(win, units=units, name=name,
                                       autoLog=False)  # set at end of init
 
+        # look-ahead buffer of dot positions (see precomputeTrajectory)
+        self._trajectory = None
+        self._trajectoryBuffer = None
+        self._trajectoryFrame = 0
+        # whether the buffer is played as it is (see playTrajectory), and the
+        # matrix that converts it to pixels
+        self._playback = False
+        self._playbackMatrix = None
+
+        # source of the uniform random numbers, see seed
+        self.__dict__['seed'] = seed
+        self._setRandom(seed)
+
+        # GL objects for the 'vbo' renderer, created on first use
+        self._program = None
+        self._liveVBO = None
+        self._trajectoryVBO = None
+
         self.nDots = nDots
         # pos and size are ambiguous for dots so DotStim explicitly has
         # fieldPos = pos, fieldSize=size and then dotSize as additional param
@@ -254,6 +343,7 @@ class WrappedDot(BaseVisualStim, ColorMixin, ContainerMixin):
         self.element = element
         self.dotLife = dotLife
         self.signalDots = signalDots
+        self.renderer = renderer
 
         self.useShaders = False  # not needed for dots?
         if rgb != None:
@@ -268,22 +358,18 @@ class WrappedDot(BaseVisualStim, ColorMixin, ContainerMixin):
         self.contrast = float(contrast)
         self.depth = depth
 
+        # positions, directions and scratch space for the update rule
+        self._kinematics = DotKinematics(self.nDots)
+        self._kinematics.rand = self._rand
+
         # initialise the dots themselves - give them all random dir and then
         # fix the first n in the array to have the direction specified
         self.coherence = coherence  # using the attributeSetter
         self.noiseDots = noiseDots
 
-        # initialise a random array of X,Y
-        self._verticesBase = self._dotsXY = self._newDotsXY(self.nDots)
         # all dots have the same speed
         self._dotsSpeed = np.ones(self.nDots, dtype=float) * self.speed
-        # abs() means we can ignore the -1 case (no life)
-        self._dotsLife = np.abs(dotLife) * np.random.rand(self.nDots)
-        # pre-allocate array for flagging dead dots
-        self._deadDots = np.zeros(self.nDots, dtype=bool)
-        # set directions (only used when self.noiseDots='direction')
-        self._dotsDir = np.random.rand(self.nDots) * _2pi
-        self._dotsDir[self._signalDots] = self.dir * _piOver180
+        self._initDots()
 
         self._update_dotsXY()
 
@@ -300,6 +386,28 @@ class WrappedDot(BaseVisualStim, ColorMixin, ContainerMixin):
         """
         self._set(attrib, val, op, log=log)
 
+    @property
+    def _verticesBase(self):
+        """Positions of the dots relative to the centre of the field. These
+        are updated in place on every frame."""
+        return self._kinematics.xy
+
+    @_verticesBase.setter
+    def _verticesBase(self, value):
+        # BaseVisualStim sets a square here, before the dots exist
+        if '_kinematics' in self.__dict__:
+            self._kinematics.xy[:] = value
+
+    @property
+    def _dotsDir(self):
+        """Direction of each dot, in radians."""
+        return self._kinematics.dirs
+
+    @property
+    def _deadDots(self):
+        """Flags for dead dots."""
+        return self._kinematics.dead
+
     @attributeSetter
     def fieldShape(self, fieldShape):
         """*'sqr'* or 'circle'. Defines the envelope used to present the dots.
@@ -323,7 +431,7 @@ class WrappedDot(BaseVisualStim, ColorMixin, ContainerMixin):
         :ref:`operations <attrib-operations>` are supported.
         """
         self.__dict__['dotLife'] = dotLife
-        self._dotsLife = abs(self.dotLife) * np.random.rand(self.nDots)
+        self._dotsLife = abs(self.dotLife) * self._rand(self.nDots)
 
     @attributeSetter
     def signalDots(self, signalDots):
@@ -355,10 +463,27 @@ class WrappedDot(BaseVisualStim, ColorMixin, ContainerMixin):
         DotStim assumes that the element uses pixels as units.
         ``None`` defaults to dots.
 
-        See `ElementArrayStim` for a faster implementation of this idea.
+        If the element is an `ElementArrayStim` (or anything else with a
+        ``.setXYs(xys)`` method) with one element per dot, all of the elements
+        are positioned at once and drawn with a single call.
         """
+        self._batchElements = hasattr(element, 'setXYs')
+        if self._batchElements:
+            if element.nElements != self.nDots:
+                raise ValueError('DotStim.element must have nDots elements')
+            self._elementXYs = np.zeros((self.nDots, 2))
         self.__dict__['element'] = element
 
+    @attributeSetter
+    def renderer(self, renderer):
+        """*'legacy'* or 'vbo'
+        Whether the dots are drawn from client-side vertex arrays, or from a
+        vertex buffer object with a shader. Ignored if `element` is set.
+        """
+        if renderer not in ('legacy', 'vbo'):
+            raise ValueError("DotStim.renderer must be 'legacy' or 'vbo'")
+        self.__dict__['renderer'] = renderer
+
     @attributeSetter
     def fieldPos(self, pos):
         """Specifying the location of the centre of the stimulus
@@ -415,12 +540,14 @@ class WrappedDot(BaseVisualStim, ColorMixin, ContainerMixin):
         """
         if not 0 <= coherence <= 1:
             raise ValueError('DotStim.coherence must be between 0 and 1')
+        self.clearTrajectory()
 
         _cohDots = coherence * self.nDots
 
         self.__dict__['coherence'] = round(_cohDots) /self.nDots
         self._signalDots = np.zeros(self.nDots, dtype=bool)
         self._signalDots[0:int(self.coherence * self.nDots)] = True
+        self._kinematics.nSignal = int(self.coherence * self.nDots)
         # for 'direction' method we need to update the direction of the number
         # of signal dots immediately, but for other methods it will be done
         # during updateXY
@@ -429,8 +556,9 @@ class WrappedDot(BaseVisualStim, ColorMixin, ContainerMixin):
         # otherwise would be signal dots adopt random directions when the become
         # sinal dots in later trails
         if self.noiseDots in ('direction', 'position', 'walk'):
-            self._dotsDir = np.random.rand(self.nDots) * _2pi
-            self._dotsDir[self._signalDots] = self.dir * _piOver180
+            self._kinematics.dirs[:] = self._rand(self.nDots) * _2pi
+            self._kinematics.dirs[self._signalDots] = self.dir * _piOver180
+            self._kinematics.updateVelocities()
 
     def setFieldCoherence(self, val, op='', log=None):
         """Usually you can use 'stim.attribute = value' syntax instead, but use 
@@ -438,18 +566,51 @@ class WrappedDot(BaseVisualStim, ColorMixin, ContainerMixin):
         """
         setAttribute(self, 'coherence', val, log, op)  # calls attributeSetter
 
+    @attributeSetter
+    def seed(self, seed):
+        """int or None. Seed of the dots' random numbers.
+
+        Setting it restarts the random numbers from the new seed and draws a
+        new field of dots (positions, lives and noise directions) from them,
+        so the same seed, with the same parameters, gives the same dots.
+        ``None`` goes back to the global numpy random state.
+        """
+        self.clearTrajectory()
+        self.__dict__['seed'] = seed
+        self._setRandom(seed)
+        self._kinematics.rand = self._rand
+        self._initDots()
+
+    def _setRandom(self, seed):
+        if seed is None:
+            self._rand = GlobalRandom().random
+        else:
+            self._rand = RandomPool(seed).random
+
+    def _initDots(self):
+        """Draw new positions, lives and directions for all the dots."""
+        # initialise a random array of X,Y
+        self._kinematics.xy[:] = self._newDotsXY(self.nDots)
+        # abs() means we can ignore the -1 case (no life)
+        self._dotsLife = np.abs(self.dotLife) * self._rand(self.nDots)
+        # set directions (only used when self.noiseDots='direction')
+        self._kinematics.dirs[:] = self._rand(self.nDots) * _2pi
+        self._kinematics.dirs[self._signalDots] = self.dir * _piOver180
+        self._kinematics.updateVelocities()
+
     @attributeSetter
     def dir(self, dir):
         """float (degrees). direction of the coherent dots. :ref:`operations 
         <attrib-operations>` are supported.
         """
-        # check which dots are signal before setting new dir
-        signalDots = self._dotsDir == (self.dir * _piOver180)
+        self.clearTrajectory()
         self.__dict__['dir'] = dir
 
-        # dots currently moving in the signal direction also need to update
-        # their direction
-        self._dotsDir[signalDots] = self.dir * _piOver180
+        # signal dots are always the leading block, and they need to follow
+        # the new direction
+        kinematics = self._kinematics
+        kinematics.dirs[:kinematics.nSignal] = self.dir * _piOver180
+        kinematics.updateVelocities()
 
     def setDir(self, val, op='', log=None):
         """Usually you can use 'stim.attribute = value' syntax instead, but use 
@@ -462,6 +623,7 @@ class WrappedDot(BaseVisualStim, ColorMixin, ContainerMixin):
         """float. speed of the dots (in *units*/frame). :ref:`operations 
         <attrib-operations>` are supported.
         """
+        self.clearTrajectory()
         self.__dict__['speed'] = speed
 
     def setSpeed(self, val, op='', log=None):
@@ -487,12 +649,32 @@ class WrappedDot(BaseVisualStim, ColorMixin, ContainerMixin):
             win = self.win
         self._selectWindow(win)
 
-        self._update_dotsXY()
+        playFrame = None
+        if self._trajectory is None:
+            self._update_dotsXY()
+            frameN = None
+        else:
+            # positions were generated ahead of time, so just take the next
+            # frame from the buffer
+            frameN = self._trajectoryFrame
+            if self._playback:
+                playFrame = self._trajectory[frameN]
+            else:
+                self.__dict__['verticesPix'] = self._trajectory[frameN]
+                self._needVertexUpdate = False
+            self._trajectoryFrame += 1
+            if self._trajectoryFrame == len(self._trajectory):
+                self.clearTrajectory()
 
         GL.glPushMatrix()  # push before drawing, pop after
 
         # draw the dots
-        if self.element is None:
+        if self.element is None and self.renderer == 'vbo':
+            win.setScale('pix')
+            if playFrame is not None:
+                GL.glMultMatrixd(self._playbackMatrix)
+            self._drawVBO(frameN)
+        elif self.element is None:
             win.setScale('pix')
             GL.glPointSize(self.dotSize)
 
@@ -505,13 +687,24 @@ class WrappedDot(BaseVisualStim, ColorMixin, ContainerMixin):
             GL.glEnable(GL.GL_TEXTURE_2D)
             GL.glBindTexture(GL.GL_TEXTURE_2D, 0)
 
-            CPCD = ctypes.POINTER(ctypes.c_double)
-            GL.glVertexPointer(2, GL.GL_DOUBLE, 0,
-                               self.verticesPix.ctypes.data_as(CPCD))
+            if playFrame is not None:
+                # straight from the played buffer, converted to pixels by GL
+                GL.glMultMatrixd(self._playbackMatrix)
+                GL.glVertexPointer(2, GL.GL_FLOAT, 0,
+                                   playFrame.ctypes.data_as(CPCF))
+            else:
+                CPCD = ctypes.POINTER(ctypes.c_double)
+                GL.glVertexPointer(2, GL.GL_DOUBLE, 0,
+                                   self.verticesPix.ctypes.data_as(CPCD))
             GL.glColor4f(*self._foreColor.render('rgba1'))
             GL.glEnableClientState(GL.GL_VERTEX_ARRAY)
             GL.glDrawArrays(GL.GL_POINTS, 0, self.nDots)
             GL.glDisableClientState(GL.GL_VERTEX_ARRAY)
+        elif self._batchElements:
+            # one draw call for all of the elements
+            np.add(self.verticesPix, self.fieldPos, out=self._elementXYs)
+            self.element.setXYs(self._elementXYs, log=False)
+            self.element.draw()
         else:
             # we don't want to do the screen scaling twice so for each dot
             # subtract the screen centre
@@ -524,6 +717,71 @@ class WrappedDot(BaseVisualStim, ColorMixin, ContainerMixin):
             self.element.setDepth(initialDepth)
         GL.glPopMatrix()
 
+    def _drawVBO(self, frameN=None):
+        """Draw the dots from vertex buffer objects. If `frameN` is `None`
+        the current `verticesPix` are uploaded first, otherwise frame `frameN`
+        of the uploaded trajectory is drawn.
+        """
+        if self._program is None:
+            self._program = shaders.compileProgram(
+                _dotsVertSource, _dotsFragSource)
+            self._pointSizeLoc = GL.glGetUniformLocation(
+                self._program, b'pointSize')
+            self._minPointSizeLoc = GL.glGetUniformLocation(
+                self._program, b'minPointSize')
+            self._minPointSize = minPointSize()
+            # float32 copy of the vertices, for uploading
+            self._liveVertices = np.zeros((self.nDots, 2), dtype=np.float32)
+            self._liveVBO = gltools.createVBO(
+                self._liveVertices, usage=GL.GL_DYNAMIC_DRAW)
+
+        if frameN is None:
+            vbo = self._liveVBO
+            first = 0
+            np.copyto(self._liveVertices, self.verticesPix)
+            gltools.bindVBO(vbo)
+            GL.glBufferSubData(
+                GL.GL_ARRAY_BUFFER, 0, vbo.size,
+                self._liveVertices.ctypes.data_as(CPCF))
+        else:
+            vbo = self._trajectoryVBO
+            first = frameN * self.nDots
+            gltools.bindVBO(vbo)
+
+        GL.glUseProgram(self._program)
+        GL.glUniform1f(self._pointSizeLoc, self.dotSize)
+        GL.glUniform1f(self._minPointSizeLoc, self._minPointSize)
+        GL.glEnable(GL.GL_VERTEX_PROGRAM_POINT_SIZE)
+        GL.glVertexPointer(2, GL.GL_FLOAT, 0, None)
+        GL.glColor4f(*self._foreColor.render('rgba1'))
+        GL.glEnableClientState(GL.GL_VERTEX_ARRAY)
+        GL.glDrawArrays(GL.GL_POINTS, first, self.nDots)
+        GL.glDisableClientState(GL.GL_VERTEX_ARRAY)
+        GL.glDisable(GL.GL_VERTEX_PROGRAM_POINT_SIZE)
+        GL.glUseProgram(0)
+        gltools.unbindVBO(vbo)
+
+    def _uploadTrajectory(self):
+        """Copy the precomputed trajectory into a vertex buffer object, so
+        that drawing a frame of it needs no data transfer.
+        """
+        self._selectWindow(self.win)
+        # no copy if the trajectory is already float32 (see playTrajectory)
+        vertices = np.ascontiguousarray(
+            self._trajectory.reshape(-1, 2), dtype=np.float32)
+        vbo = self._trajectoryVBO
+        if vbo is None or vbo.shape != vertices.shape:
+            if vbo is not None:
+                gltools.deleteVBO(vbo)
+            self._trajectoryVBO = gltools.createVBO(
+                vertices, usage=GL.GL_DYNAMIC_DRAW)
+        else:
+            gltools.bindVBO(vbo)
+            GL.glBufferSubData(
+                GL.GL_ARRAY_BUFFER, 0, vbo.size,
+                vertices.ctypes.data_as(CPCF))
+            gltools.unbindVBO(vbo)
+
     def _newDotsXY(self, nDots):
         """Returns a uniform spread of dots, according to the `fieldShape` and
         `fieldSize`.
@@ -545,64 +803,122 @@ class WrappedDot(BaseVisualStim, ColorMixin, ContainerMixin):
             dots = self._newDots(nDots)
 
         """
-        if self.fieldShape == 'circle':
-            length = np.sqrt(np.random.uniform(0, 1, (nDots,)))
-            angle = np.random.uniform(0., _2pi, (nDots,))
+        return newDotsXY(nDots, self.fieldShape, self.fieldSize, self._rand)
 
-            newDots = np.zeros((nDots, 2))
-            newDots[:, 0] = length * np.cos(angle)
-            newDots[:, 1] = length * np.sin(angle)
+    def refreshDots(self):
+        """Callable user function to choose a new set of dots."""
+        self.clearTrajectory()
+        self._kinematics.xy[:] = self._newDotsXY(self.nDots)
 
-            newDots *= self.fieldSize * .5
-        else:
-            newDots = np.random.uniform(-0.5, 0.5, size = (nDots, 2)) * self.fieldSize
+    def precomputeTrajectory(self, nFrames):
+        """Generate the dot positions for the next `nFrames` calls to
+        `.draw()` in one go.
 
-        return newDots
+        The dots are moved forward `nFrames` times and all of the resulting
+        positions are converted to pixels at once, so that each subsequent
+        `.draw()` only needs to index the buffer. Once the buffer has been
+        used up, `.draw()` goes back to updating the dots on every frame,
+        continuing from the last precomputed position. Setting `dir`,
+        `coherence` or `speed`, or calling `refreshDots()`, discards the
+        buffer.
 
-    def refreshDots(self):
-        """Callable user function to choose a new set of dots."""
-        self._verticesBase = self._dotsXY = self._newDotsXY(self.nDots)
+        This is intended to be called while nothing time-critical is
+        happening, e.g., while waiting on a `StaticPeriod`.
+
+        Parameters
+        ----------
+        nFrames : int
+            Number of frames to generate.
+
+        """
+        self.clearTrajectory()
+        shape = (nFrames, self.nDots, 2)
+        if self._trajectoryBuffer is None or \
+                self._trajectoryBuffer.shape != shape:
+            self._trajectoryBuffer = np.empty(shape)
+        trajectory = self._trajectoryBuffer
+
+        for frameN in range(nFrames):
+            self._move_dotsXY()
+            trajectory[frameN] = self._verticesBase
+
+        # same transformation as BaseVisualStim._updateVertices, but applied
+        # to every frame at once
+        trajectory[:] = convertToPix(
+            vertices=np.dot(trajectory, self._rotationMatrix),
+            pos=self.pos, win=self.win, units=self.units)
+        self._trajectory = trajectory
+        self._trajectoryFrame = 0
+
+        if self.renderer == 'vbo':
+            self._uploadTrajectory()
+
+    def playTrajectory(self, frames):
+        """Draw the next ``len(frames)`` calls to `.draw()` from dot positions
+        generated elsewhere, e.g. by trajectorycache.py.
+
+        Unlike `precomputeTrajectory`, nothing is computed or copied: each
+        frame is drawn as it is, straight from `frames` (which may be a view
+        onto a memory-mapped file), and OpenGL converts it to pixels. Once the
+        frames have been used up, `.draw()` goes back to updating the dots on
+        every frame, from their positions before playback. Setting `dir`,
+        `coherence` or `speed`, or calling `refreshDots()`, stops playback.
 
-        # Don't allocate another array if the new number of dots is equal to
-        # the last.
-        if self.nDots != len(self._deadDots):
-            self._deadDots = np.zeros(self.nDots, dtype=bool)
+        Parameters
+        ----------
+        frames : ndarray
+            nFrames x nDots x 2 array of float32 positions, in the units of the
+            stimulus, relative to the centre of the field. The units must be
+            a linear function of pixels (e.g. 'deg', but not 'degFlat'), and
+            `element` must be `None`.
+
+        """
+        if self.units not in _linearUnits:
+            raise ValueError(
+                "WrappedDot can not play trajectories in %s units" % self.units)
+        if self.element is not None:
+            raise ValueError("WrappedDot can only play trajectories of dots")
+        if frames.dtype != np.float32 or frames.shape[1:] != (self.nDots, 2):
+            raise ValueError(
+                "trajectory must be float32 with shape (nFrames, %d, 2)"
+                % self.nDots)
+        self.clearTrajectory()
+        # read every page of the frames now, rather than while drawing them
+        frames.sum()
+
+        # positions to pixels, as an affine transform for glMultMatrixd:
+        # pix = xy . rotation . axes + origin
+        origin = convertToPix(vertices=np.zeros((1, 2)), pos=self.pos,
+                              win=self.win, units=self.units)[0]
+        axes = convertToPix(vertices=np.eye(2), pos=(0, 0),
+                            win=self.win, units=self.units) \
+            - convertToPix(vertices=np.zeros((2, 2)), pos=(0, 0),
+                           win=self.win, units=self.units)
+        matrix = np.eye(4)
+        matrix[:2, :2] = np.dot(self._rotationMatrix, axes)
+        matrix[3, :2] = origin
+        self._playbackMatrix = (GL.GLdouble * 16)(*matrix.ravel())
+
+        self._trajectory = frames
+        self._trajectoryFrame = 0
+        self._playback = True
+
+        if self.renderer == 'vbo':
+            self._uploadTrajectory()
+
+    def clearTrajectory(self):
+        """Discard any precomputed dot positions, so that `.draw()` updates
+        the dots on every frame again.
+        """
+        self._trajectory = None
+        self._trajectoryFrame = 0
+        self._playback = False
 
     def _update_dotsXY(self):
-        # update the locations of signal and noise; 0 radians=East!
-        if self.noiseDots == 'walk':
-            # noise dots are ~self._signalDots
-            sig = np.random.rand(np.sum(~self._signalDots))
-            self._dotsDir[~self._signalDots] = sig * np.pi*2
-            # then update all positions from dir*speed
-            cosDots = np.reshape(np.cos(self._dotsDir), (self.nDots,))
-            sinDots = np.reshape(np.sin(self._dotsDir), (self.nDots,))
-            self._verticesBase[:, 0] += self.speed * cosDots
-            self._verticesBase[:, 1] += self.speed * sinDots
-        elif self.noiseDots == 'direction':
-            # simply use the stored directions to update position
-            self._verticesBase[:, 0] += self.speed * np.cos(self._dotsDir)
-            self._verticesBase[:, 1] += self.speed * np.sin(self._dotsDir)
-        elif self.noiseDots == 'position':
-            # update signal dots
-            sd = self._signalDots
-            sdSum = self._signalDots.sum()
-            cosDots = np.reshape(np.cos(self._dotsDir[sd]), (sdSum,))
-            sinDots = np.reshape(np.sin(self._dotsDir[sd]), (sdSum,))
-            self._verticesBase[sd, 0] += self.speed * cosDots
-            self._verticesBase[sd, 1] += self.speed * sinDots
-            # update noise dots
-            self._deadDots[:] = self._deadDots + (~self._signalDots)
-
-        # handle boundaries of the field
-        norms = np.linalg.norm(self._verticesBase, axis=1)
-        dist_beyond = np.clip(norms - self.fieldSize[0]/2, 0, None)
-        # reflect those vertices which are beyond the boundary
-        self._verticesBase[dist_beyond > 0] *= -1 
-        # push the dot back to the boundary (dist_beyond once), then through the boundary 
-        # based on how far it overshot (dist_beyond twice)
-        self._verticesBase[:, 0] += 2*dist_beyond * np.cos(self._dotsDir)
-        self._verticesBase[:, 1] += 2*dist_beyond * np.sin(self._dotsDir)
+        self._move_dotsXY()
 
         # update the pixel XY coordinates in pixels (using _BaseVisual class)
         self._updateVertices()
+
+    def _move_dotsXY(self):
+        self._kinematics.step(self.speed, self.fieldSize[0] / 2, self.noiseDots)
@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Several fields of dots (e.g. target and distractor apertures), moved together
+and drawn with a single draw call.
+
+Each field behaves like a `WrappedDot` with the same parameters, but the dots of
+all of the fields are kept in shared arrays: one `DotKinematics` moves every dot
+(with per-dot speeds and field radii) in one vectorized pass, and all of the dots
+are drawn by one ``glDrawArrays`` call, with the color and size of each dot passed
+as vertex arrays. The cost of a frame depends on the total number of dots, not on
+the number of fields.
+"""
+
+import ctypes
+
+import pyglet
+pyglet.options['debug_gl'] = False
+GL = pyglet.gl
+
+from psychopy import logging
+from psychopy.colors import Color
+from psychopy.tools.attributetools import attributeSetter
+from psychopy.tools.arraytools import val2array
+from psychopy.tools.monitorunittools import convertToPix
+from psychopy.visual import shaders
+from psychopy.visual.basevisual import BaseVisualStim
+
+import numpy as np
+
+from dot import minPointSize
+from kinematics import DotKinematics, GlobalRandom, RandomPool, newDotsXY
+
+# some constants
+_piOver180 = np.pi / 180.
+_2pi = 2 * np.pi
+
+CPCF = ctypes.POINTER(ctypes.c_float)
+CPCD = ctypes.POINTER(ctypes.c_double)
+
+# vertices are in pixels, and each has its own color and point size
+_fieldsVertSource = '''
+#version 120
+attribute float pointSize;
+// see dot.minPointSize
+uniform float minPointSize;
+
+void main() {
+    gl_Position = gl_ModelViewProjectionMatrix * gl_Vertex;
+    gl_FrontColor = gl_Color;
+    gl_PointSize = max(pointSize, minPointSize);
+}
+'''
+
+_fieldsFragSource = '''
+#version 120
+
+void main() {
+    gl_FragColor = gl_Color;
+}
+'''
+
+# parameters of a field, and their defaults (those of WrappedDot)
+fieldDefaults = dict(
+    nDots=1,
+    coherence=0.5,
+    fieldPos=(0.0, 0.0),
+    fieldSize=(1.0, 1.0),
+    dotSize=2.0,
+    dir=0.0,
+    speed=0.5,
+    color=(1.0, 1.0, 1.0),
+    colorSpace='rgb',
+    opacity=1.0)
+
+
+class DotFields(BaseVisualStim):
+    """Fields of dots that share a window, units, field shape and type of noise.
+
+    The signal dots of every field come first in the shared arrays, followed by
+    the noise dots of every field, so that a single `DotKinematics` handles all
+    of the fields' signal and noise dots.
+
+    Attributes
+    ----------
+    fields : list of dict
+        Parameters of each field: nDots, coherence, fieldPos, fieldSize,
+        dotSize (pixels), dir, speed (*units*/frame), color, colorSpace and
+        opacity, as for `WrappedDot`. Change them with the `setField...`
+        methods.
+    fieldShape : str
+        *'circle'* or 'sqr'.
+    noiseDots : str
+        *'direction'*, 'position' or 'walk', see `WrappedDot.noiseDots`.
+    seed : int or None
+        Seed of the dots' random numbers. Setting it draws new dots for every
+        field.
+
+    """
+    def __init__(self,
+                 win,
+                 fields,
+                 units='',
+                 fieldShape='circle',
+                 noiseDots='direction',
+                 seed=None,
+                 name=None,
+                 autoLog=None):
+        """
+        Parameters
+        ----------
+        win : window.Window
+            Window the fields are drawn to.
+        fields : list of dict
+            Parameters of each field (see `fieldDefaults`); those that are not
+            given take the defaults of `WrappedDot`.
+        units : str
+            Units of the fields' positions, sizes and speeds. Positions are
+            added to the dots' before converting them to pixels.
+        fieldShape : str
+            'circle' or 'sqr', for every field.
+        noiseDots : str
+            'direction', 'position' or 'walk', for every field.
+        seed : int, optional
+            Seed of the random numbers, see `WrappedDot`. ``None`` uses the
+            global numpy random state.
+        name : str, optional
+            Optional name to use for logging.
+        autoLog : bool
+            Enable automatic logging.
+
+        """
+        super().__init__(win, units=units, name=name, autoLog=False)
+
+        self.fields = [dict(fieldDefaults, **field) for field in fields]
+        self.nFields = len(self.fields)
+        self.fieldShape = fieldShape
+        self.noiseDots = noiseDots
+
+        nDots = np.array([field['nDots'] for field in self.fields])
+        # rounded as WrappedDot.coherence does
+        nSignal = np.array([
+            int(round(field['coherence'] * field['nDots']) / field['nDots']
+                * field['nDots'])
+            for field in self.fields])
+        self.nDots = int(nDots.sum())
+        fieldIndex = np.arange(self.nFields)
+        self._field = np.concatenate([
+            np.repeat(fieldIndex, nSignal), np.repeat(fieldIndex, nDots - nSignal)])
+        self._fieldDots = [np.flatnonzero(self._field == i) for i in fieldIndex]
+        self._fieldSignal = [
+            dots[dots < nSignal.sum()] for dots in self._fieldDots]
+
+        self._kinematics = DotKinematics(self.nDots)
+        self._kinematics.nSignal = nSignal.sum()
+
+        # parameters of each dot's field
+        self._dirs = np.zeros(self.nFields)
+        # the same shape as the velocities, so that step() multiplies them
+        # without broadcasting (which allocates a buffer on every frame)
+        self._speed = np.zeros((self.nDots, 2))
+        self._radius = np.zeros(self.nDots)
+        self._fieldSize = np.zeros((self.nDots, 2))
+        self._fieldPos = np.zeros((self.nDots, 2))
+        self._colors = np.zeros((self.nDots, 4), dtype=np.float32)
+        self._sizes = np.zeros(self.nDots, dtype=np.float32)
+        self._vertices = np.zeros((self.nDots, 2))
+        for i, field in enumerate(self.fields):
+            self.setFieldPos(i, field['fieldPos'])
+            self.setFieldSize(i, field['fieldSize'])
+            self.setFieldSpeed(i, field['speed'])
+            self.setFieldDotSize(i, field['dotSize'])
+            self.setFieldColor(i, field['color'], field['colorSpace'],
+                               field['opacity'])
+            self._dirs[i] = field['dir'] * _piOver180
+
+        # shader program, created on first use
+        self._program = None
+
+        self.seed = seed
+
+        # set autoLog now that params have been initialised
+        wantLog = autoLog is None and self.win.autoLog
+        self.__dict__['autoLog'] = autoLog or wantLog
+        if self.autoLog:
+            logging.exp("Created %s = %s" % (self.name, str(self)))
+
+    @attributeSetter
+    def seed(self, seed):
+        """int or None. Seed of the dots' random numbers.
+
+        Setting it restarts the random numbers from the new seed and draws new
+        dots for every field. A single field gets the same dots as setting the
+        same seed on a `WrappedDot` with the same parameters.
+        """
+        self.__dict__['seed'] = seed
+        if seed is None:
+            self._rand = GlobalRandom().random
+        else:
+            self._rand = RandomPool(seed).random
+        self._kinematics.rand = self._rand
+        self.refreshDots()
+
+    def refreshDots(self):
+        """Draw new positions and directions for the dots of every field."""
+        kinematics = self._kinematics
+        kinematics.xy[:] = newDotsXY(
+            self.nDots, self.fieldShape, self._fieldSize, self._rand)
+        # drawn (and not used) where WrappedDot draws its dots' lives
+        self._rand(self.nDots)
+        kinematics.dirs[:] = self._rand(self.nDots) * _2pi
+        signal = slice(0, kinematics.nSignal)
+        kinematics.dirs[signal] = self._dirs[self._field[signal]]
+        kinematics.updateVelocities()
+
+    def setFieldDir(self, i, dir):
+        """Direction (degrees) of the signal dots of the ith field."""
+        self.fields[i]['dir'] = dir
+        self._dirs[i] = dir * _piOver180
+        self._kinematics.dirs[self._fieldSignal[i]] = self._dirs[i]
+        self._kinematics.updateVelocities()
+
+    def setFieldPos(self, i, pos):
+        """Position of the centre of the ith field, in *units*."""
+        self.fields[i]['fieldPos'] = pos
+        self._fieldPos[self._fieldDots[i]] = val2array(pos, False, False)
+
+    def setFieldSize(self, i, size):
+        """Size of the ith field, in *units*. Dots outside of it come back in
+        on the following frames."""
+        self.fields[i]['fieldSize'] = size
+        size = val2array(size, False)
+        self._fieldSize[self._fieldDots[i]] = size
+        self._radius[self._fieldDots[i]] = size[0] / 2
+
+    def setFieldSpeed(self, i, speed):
+        """Speed of the dots of the ith field, in *units* per frame."""
+        self.fields[i]['speed'] = speed
+        self._speed[self._fieldDots[i]] = speed
+
+    def setFieldDotSize(self, i, dotSize):
+        """Size of the dots of the ith field, in pixels."""
+        self.fields[i]['dotSize'] = dotSize
+        if self.win.useRetina:
+            dotSize *= 2  # double dot size to make up for 1/2-size pixels
+        self._sizes[self._fieldDots[i]] = dotSize
+
+    def setFieldColor(self, i, color, colorSpace=None, opacity=None):
+        """Color (and opacity) of the dots of the ith field."""
+        field = self.fields[i]
+        field['color'] = color
+        if colorSpace is not None:
+            field['colorSpace'] = colorSpace
+        if opacity is not None:
+            field['opacity'] = opacity
+        rgba = np.array(
+            Color(color, field['colorSpace']).render('rgba1'), dtype=np.float32)
+        rgba[3] *= field['opacity']
+        self._colors[self._fieldDots[i]] = rgba
+
+    def draw(self, win=None):
+        """Move the dots of every field by one frame and draw them.
+
+        Parameters
+        ----------
+        win : window.Window, optional
+            Window to draw dots to. If `None`, dots will be drawn to the parent
+            window.
+
+        """
+        if win is None:
+            win = self.win
+        self._selectWindow(win)
+
+        self._kinematics.step(self._speed, self._radius, self.noiseDots)
+        np.add(self._kinematics.xy, self._fieldPos, out=self._vertices)
+        self.__dict__['verticesPix'] = np.ascontiguousarray(convertToPix(
+            vertices=self._vertices, pos=(0, 0), win=win, units=self.units))
+
+        if self._program is None:
+            self._program = shaders.compileProgram(
+                _fieldsVertSource, _fieldsFragSource)
+            self._pointSizeLoc = GL.glGetAttribLocation(
+                self._program, b'pointSize')
+            self._minPointSizeLoc = GL.glGetUniformLocation(
+                self._program, b'minPointSize')
+            self._minPointSize = minPointSize()
+
+        GL.glPushMatrix()  # push before drawing, pop after
+        win.setScale('pix')
+        GL.glUseProgram(self._program)
+        GL.glUniform1f(self._minPointSizeLoc, self._minPointSize)
+        GL.glEnable(GL.GL_VERTEX_PROGRAM_POINT_SIZE)
+        GL.glVertexPointer(2, GL.GL_DOUBLE, 0,
+                           self.verticesPix.ctypes.data_as(CPCD))
+        GL.glColorPointer(4, GL.GL_FLOAT, 0, self._colors.ctypes.data_as(CPCF))
+        GL.glVertexAttribPointer(self._pointSizeLoc, 1, GL.GL_FLOAT,
+                                 GL.GL_FALSE, 0,
+                                 self._sizes.ctypes.data_as(CPCF))
+        GL.glEnableClientState(GL.GL_VERTEX_ARRAY)
+        GL.glEnableClientState(GL.GL_COLOR_ARRAY)
+        GL.glEnableVertexAttribArray(self._pointSizeLoc)
+        # every dot of every field at once
+        GL.glDrawArrays(GL.GL_POINTS, 0, self.nDots)
+        GL.glDisableVertexAttribArray(self._pointSizeLoc)
+        GL.glDisableClientState(GL.GL_COLOR_ARRAY)
+        GL.glDisableClientState(GL.GL_VERTEX_ARRAY)
+        GL.glDisable(GL.GL_VERTEX_PROGRAM_POINT_SIZE)
+        GL.glUseProgram(0)
+        GL.glPopMatrix()
@@ -0,0 +1,242 @@
+"""Export iohub datastores to partitioned Parquet, for analysing many sessions at once.
+
+Each session (hdf5 file) is read a chunk of rows at a time and written to
+
+    {out}/trials/session={name}/part-0.parquet    trial records (condition variables)
+    {out}/keyboard/session={name}/part-0.parquet  keyboard events
+    {out}/flips/session={name}/part-0.parquet     time of every flip of the dots
+
+where name is the file name without its extension, so the output can be read as one
+dataset partitioned by session (e.g. pyarrow.dataset, or arrow::open_dataset in R).
+Flips come from the per-trial fliplog messages (see fliplog.py), or from the one
+message per flip that older sessions sent. Those only name the trial, so their block
+is taken from the trial records, which were added in the same order.
+
+Sessions are exported in parallel, each by its own process. {out}/manifest.json
+records the size and modification time of every exported file, and files that have
+not changed since are skipped.
+
+example:
+    python export.py data-raw -o data-parquet
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+import fliplog
+
+chunk_rows = 100000
+legacy_flip_category = b'flip'
+
+
+def chunks(table, n: int = chunk_rows) -> Iterator[np.ndarray]:
+    for start in range(0, table.nrows, n):
+        yield table.read(start=start, stop=min(start + n, table.nrows))
+
+
+def to_arrow(rows: np.ndarray):
+    """Arrow table of a structured array, with byte strings decoded."""
+    import pyarrow as pa
+
+    columns = {}
+    for name in rows.dtype.names:
+        x = rows[name]
+        if x.dtype.kind == 'S':
+            columns[name] = pa.array(np.char.decode(x, 'utf-8'))
+        elif x.ndim > 1:
+            columns[name] = pa.array(list(x))
+        else:
+            columns[name] = pa.array(x)
+    return pa.table(columns)
+
+
+class PartWriter(object):
+    """Parquet file written one row group at a time, only created once there are rows."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.writer = None
+        self.n = 0
+
+
+    def write(self, table) -> None:
+        import pyarrow.parquet as pq
+
+        if table.num_rows == 0:
+            return
+        if self.writer is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+        self.n += table.num_rows
+
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+def legacy_flips(messages: np.ndarray) -> pd.DataFrame:
+    """Flips (trial, flip, time) of the 'trial-{trial}_flip-{flip}' messages sent
+    before fliplog."""
+    rows = messages[messages['category'] == legacy_flip_category]
+    if len(rows) == 0:
+        return pd.DataFrame({'trial': np.empty(0, int), 'flip': np.empty(0, int), 'time': np.empty(0)})
+    parts = pd.Series(rows['text'].astype(str)).str.extract(r'trial-(\d+)_flip-(\d+)')
+    return pd.DataFrame({
+        'trial': parts[0].astype(int).to_numpy(),
+        'flip': parts[1].astype(int).to_numpy(),
+        'time': rows['time']})
+
+
+def legacy_blocks(flips: pd.DataFrame, records: pd.DataFrame) -> pd.DataFrame:
+    """Legacy flips with the block of their trial.
+
+    The messages only name the trial, which restarts in every block. Trials were run,
+    and their records (block, trial) added, in the same order as their flips were
+    sent, so the k-th trial of the flips (a new one starts whenever flip does not
+    increase) is the k-th record. Trials without a matching record (e.g. the last
+    one of an aborted session) get block -1.
+    """
+    flip = flips['flip'].to_numpy()
+    start = np.ones(len(flips), dtype=bool)
+    start[1:] = flip[1:] <= flip[:-1]
+    k = np.cumsum(start) - 1
+    block = np.full(len(flips), -1)
+    matched = k < len(records)
+    block[matched] = records['block'].to_numpy()[k[matched]]
+    mismatched = np.zeros(len(flips), dtype=bool)
+    mismatched[matched] = records['trial'].to_numpy()[k[matched]] != flips['trial'].to_numpy()[matched]
+    block[mismatched] = -1
+    return flips.assign(block=block)[['block', 'trial', 'flip', 'time']]
+
+
+def export_session(datastore: str, out: str) -> Dict[str, int]:
+    """Write one session's tables; returns the number of rows of each."""
+    import pyarrow as pa
+    import tables
+
+    name = os.path.splitext(os.path.basename(datastore))[0]
+    # written next to the output, then moved into place, so a failed export leaves
+    # the previous one (if any) as it was
+    tmp = os.path.join(out, f'.tmp-{name}')
+    shutil.rmtree(tmp, ignore_errors=True)
+    writers = {
+        table: PartWriter(os.path.join(tmp, table, f'session={name}', 'part-0.parquet'))
+        for table in ['trials', 'keyboard', 'flips']}
+
+    try:
+        with tables.open_file(datastore, mode='r') as f:
+            data_collection = f.root.data_collection
+            # block and trial of every record, in the order they were run, to find
+            # the blocks of legacy flips
+            records: List[pd.DataFrame] = []
+            for cv in data_collection.condition_variables:
+                for rows in chunks(cv):
+                    writers['trials'].write(to_arrow(rows))
+                    if 'block' in rows.dtype.names and 'trial' in rows.dtype.names:
+                        records.append(pd.DataFrame({'block': rows['block'], 'trial': rows['trial']}))
+
+            events = data_collection.events
+            if '/data_collection/events/keyboard/KeyboardInputEvent' in f:
+                for rows in chunks(events.keyboard.KeyboardInputEvent):
+                    writers['keyboard'].write(to_arrow(rows))
+
+            # fliplog messages of a trial may be split across chunks, and the blocks of
+            # legacy flips depend on the trials before them, so both are collected
+            # (they are small) and decoded at the end
+            texts: List[str] = []
+            legacy: List[pd.DataFrame] = []
+            if '/data_collection/events/experiment/MessageEvent' in f:
+                for rows in chunks(events.experiment.MessageEvent):
+                    texts.extend(rows['text'][rows['category'] == fliplog.category.encode()].astype(str))
+                    legacy.append(legacy_flips(rows))
+            if legacy:
+                flips = legacy_blocks(
+                    pd.concat(legacy, ignore_index=True),
+                    pd.concat(records, ignore_index=True) if records else
+                    pd.DataFrame({'block': np.empty(0, int), 'trial': np.empty(0, int)}))
+                writers['flips'].write(pa.Table.from_pandas(flips, preserve_index=False))
+            writers['flips'].write(pa.Table.from_pandas(fliplog.parse(texts), preserve_index=False))
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    for table in writers:
+        target = os.path.join(out, table, f'session={name}')
+        shutil.rmtree(target, ignore_errors=True)
+        source = os.path.join(tmp, table, f'session={name}')
+        if os.path.exists(source):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(source, target)
+    shutil.rmtree(tmp, ignore_errors=True)
+    return {table: writer.n for table, writer in writers.items()}
+
+
+def signature(path: str) -> List[int]:
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def export(
+    datastores: List[str],
+    out: str,
+    jobs: Optional[int] = None,
+    force: bool = False) -> Dict[str, Dict[str, int]]:
+    """Export every datastore that changed since the last export to out."""
+    os.makedirs(out, exist_ok=True)
+    manifest_path = os.path.join(out, 'manifest.json')
+    manifest = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    todo = [
+        f for f in datastores
+        if manifest.get(os.path.basename(f), {}).get('signature') != signature(f)]
+    exported = {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(export_session, f, out): f for f in todo}
+        for future in as_completed(futures):
+            f = futures[future]
+            rows = future.result()
+            manifest[os.path.basename(f)] = {'signature': signature(f), 'rows': rows}
+            exported[f] = rows
+            # saved after every session, so that an interrupted export can resume
+            with open(manifest_path + '.tmp', 'w') as m:
+                json.dump(manifest, m, indent=1)
+            os.replace(manifest_path + '.tmp', manifest_path)
+    return exported
+
+
+def find_datastores(paths: List[Union[str, os.PathLike]]) -> List[str]:
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(sorted(glob.glob(os.path.join(path, '*.hdf5'))))
+        else:
+            found.append(str(path))
+    return found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("datastores", help="iohub hdf5 files, or directories of them", nargs='+')
+    parser.add_argument("-o", "--out", help="directory to write the dataset to", required=True)
+    parser.add_argument("-j", "--jobs", help="number of processes (default: one per cpu)", type=int, default=None)
+    parser.add_argument("--force", help="export every file, even if unchanged", action='store_true', default=False)
+    args = parser.parse_args()
+
+    datastores = find_datastores(args.datastores)
+    exported = export(datastores, args.out, jobs=args.jobs, force=args.force)
+    for f, rows in sorted(exported.items()):
+        print(f"{os.path.basename(f)}: " + ', '.join(f'{n} {table}' for table, n in rows.items()))
+    print(f'{len(exported)} of {len(datastores)} sessions exported, {len(datastores) - len(exported)} unchanged')
@@ -0,0 +1,119 @@
+"""Times of the flips of each trial's dots, recorded in the frame loop and sent to
+iohub once per trial.
+
+Sending an iohub message on every flip costs string formatting and a round trip to
+the iohub server inside the frame loop. Instead, flip times are written into a
+preallocated array, and sent after the dots are gone as a handful of messages
+(category "fliplog") holding the whole trial. Each message's text is
+
+    {block} {trial} {part} {n_parts} {payload}
+
+where the payloads of the parts, joined, are the base85 encoding of the zlib
+compressed record: the time of the first flip (float64, seconds) followed by the
+differences between the times of successive flips, in integer microseconds
+(int32). Rounding happens on offsets from the first flip, so it does not accumulate.
+
+example:
+    python fliplog.py data-raw/*.hdf5 -o flips.csv
+"""
+
+import argparse
+import base64
+import os
+import zlib
+from typing import Iterable, List, Union
+
+import numpy as np
+import pandas as pd
+
+category = 'fliplog'
+# iohub message texts are at most 128 characters, including the header
+payload_chars = 96
+
+
+class FlipLog(object):
+
+    def __init__(self, n_flips: int):
+        self.times = np.full(n_flips, np.nan)
+        self.n = 0
+
+
+    def reset(self) -> None:
+        self.n = 0
+
+
+    def record(self, flip: int, time: float) -> None:
+        self.times[flip] = time
+        self.n = flip + 1
+
+
+    def encode(self, block: int, trial: int) -> List[str]:
+        """Message texts holding the flips recorded since the last reset."""
+        times = self.times[:self.n]
+        offsets = np.rint((times - times[0]) * 1e6).astype(np.int64) if self.n else times
+        record = times[:1].astype('<f8').tobytes() + np.diff(offsets).astype('<i4').tobytes()
+        payload = base64.b85encode(zlib.compress(record)).decode('ascii')
+        parts = [payload[i:i + payload_chars] for i in range(0, len(payload), payload_chars)]
+        return [f'{block} {trial} {part} {len(parts)} {x}' for part, x in enumerate(parts)]
+
+
+    def flush(self, io, block: int, trial: int) -> None:
+        """Send the flips recorded since the last reset to iohub, and reset."""
+        for text in self.encode(block, trial):
+            io.sendMessageEvent(text, category=category)
+        self.reset()
+
+
+def decode(payload: str) -> np.ndarray:
+    """Flip times of the joined payloads of a trial."""
+    record = zlib.decompress(base64.b85decode(payload))
+    if not record:
+        return np.empty(0)
+    start = np.frombuffer(record[:8], dtype='<f8')[0]
+    offsets = np.concatenate([[0], np.cumsum(np.frombuffer(record[8:], dtype='<i4'))])
+    return start + offsets / 1e6
+
+
+def parse(texts: Iterable[str]) -> pd.DataFrame:
+    """One row per flip (block, trial, flip, time) from fliplog message texts."""
+    parts = pd.DataFrame(
+        [text.split(' ', 4) for text in texts],
+        columns=['block', 'trial', 'part', 'n_parts', 'payload'])
+    if parts.empty:
+        return pd.DataFrame({'block': [], 'trial': [], 'flip': [], 'time': []})
+    parts[['block', 'trial', 'part', 'n_parts']] = parts[['block', 'trial', 'part', 'n_parts']].astype(int)
+
+    trials = []
+    for (block, trial), d in parts.groupby(['block', 'trial'], sort=False):
+        d = d.sort_values(by='part')
+        if len(d) != d['n_parts'].iloc[0]:
+            raise ValueError(f'block {block} trial {trial}: {len(d)} of {d["n_parts"].iloc[0]} parts')
+        time = decode(''.join(d['payload']))
+        trials.append(pd.DataFrame({
+            'block': block,
+            'trial': trial,
+            'flip': np.arange(len(time)),
+            'time': time}))
+    return pd.concat(trials, ignore_index=True)
+
+
+def read_flips(datastore: Union[str, os.PathLike]) -> pd.DataFrame:
+    """Flip times of every trial of an iohub hdf5 datastore."""
+    # slow to import, and only needed after the session
+    import tables
+
+    with tables.open_file(datastore, mode='r') as f:
+        messages = f.root.data_collection.events.experiment.MessageEvent.read()
+    texts = messages['text'][messages['category'] == category.encode()]
+    return parse(x.decode('ascii') for x in texts)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("datastores", help="iohub hdf5 files", nargs='+')
+    parser.add_argument("-o", "--out", help="csv file to write the flip times to", required=True)
+    args = parser.parse_args()
+
+    pd.concat(
+        [read_flips(f).assign(datastore=os.path.basename(f)) for f in args.datastores],
+        ignore_index=True).to_csv(args.out, index=False)
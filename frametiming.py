@@ -0,0 +1,176 @@
+"""Timing of every flip of a session, and how well it kept to the refresh rate.
+
+Each flip is recorded with the epoch it starts (fix, cue, dots, feedback, or other
+for instruction and rest screens) and the trial it belongs to. The interval until
+the next flip is how long that flip's frame stayed on screen, so
+
+- an interval of about one refresh period is a frame shown once, as intended
+- n periods (n > 1) means n - 1 frames were dropped
+- less than half a period means the flip did not wait for a new frame, so the
+  frame was never shown (or was shown twice, in place of the next one)
+
+The report has one row per trial and epoch: how many frames it lasted versus how
+many it should have, the dropped and duplicated frames, and the jitter of its
+intervals. A histogram of the dots intervals summarises the whole session.
+
+example:
+    python frametiming.py data-raw/sub-1_task-main_frames.npz
+"""
+
+import argparse
+from enum import IntEnum
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class Epoch(IntEnum):
+    other = 0
+    fix = 1
+    cue = 2
+    dots = 3
+    feedback = 4
+
+
+# bins of the histogram, in refresh periods
+histogram_bins = np.arange(0, 4.05, 0.1)
+
+
+class FrameTimes(object):
+    """Time, epoch and trial of every flip, in preallocated arrays."""
+
+    def __init__(self, capacity: int = 4096):
+        self.time = np.empty(capacity)
+        self.epoch = np.empty(capacity, dtype=np.int8)
+        self.trial = np.empty(capacity, dtype=np.int32)
+        self.n = 0
+
+
+    def record(self, time: float, epoch: Epoch, trial: int = -1) -> None:
+        if self.n == len(self.time):
+            # only happens when the capacity was underestimated
+            self.time, self.epoch, self.trial = (
+                np.concatenate([x, np.empty_like(x)]) for x in (self.time, self.epoch, self.trial))
+        self.time[self.n] = time
+        self.epoch[self.n] = epoch
+        self.trial[self.n] = trial
+        self.n += 1
+
+
+    def flips(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            'time': self.time[:self.n],
+            'epoch': self.epoch[:self.n],
+            'trial': self.trial[:self.n]})
+
+
+    def save(self, path: str, period: float, expected_sec: Dict[Epoch, Optional[float]]) -> None:
+        np.savez(
+            path,
+            time=self.time[:self.n],
+            epoch=self.epoch[:self.n],
+            trial=self.trial[:self.n],
+            period=period,
+            # NaN for epochs that should last one frame per flip
+            expected_sec=[np.nan if expected_sec.get(e) is None else expected_sec[e] for e in Epoch])
+
+
+def load(path: str) -> Tuple[pd.DataFrame, float, Dict[Epoch, Optional[float]]]:
+    """Flips (time, epoch, trial), nominal refresh period and expected epoch durations
+    of a saved session."""
+    with np.load(path) as f:
+        flips = pd.DataFrame({'time': f['time'], 'epoch': f['epoch'], 'trial': f['trial']})
+        expected_sec = {e: None if np.isnan(x) else float(x) for e, x in zip(Epoch, f['expected_sec'])}
+        return flips, float(f['period']), expected_sec
+
+
+def intervals(flips: pd.DataFrame) -> np.ndarray:
+    """Time from each flip to the next (NaN for the last flip)."""
+    return np.append(np.diff(flips['time'].to_numpy()), np.nan)
+
+
+def measured_period(flips: pd.DataFrame, nominal: float) -> float:
+    """Median interval of the dots flips, which should each last one frame."""
+    dots = intervals(flips)[flips['epoch'].to_numpy() == Epoch.dots]
+    dots = dots[np.abs(dots - nominal) < nominal / 2]
+    return float(np.median(dots)) if len(dots) else nominal
+
+
+def summarize(
+    flips: pd.DataFrame,
+    period: float,
+    expected_sec: Dict[Epoch, Optional[float]]) -> pd.DataFrame:
+    """One row per trial and epoch.
+
+    expected_sec is how long each epoch should last; None means one frame per flip.
+    """
+    d = flips.assign(interval=intervals(flips))
+    d['frames'] = np.rint(d['interval'] / period)
+    d['dropped'] = np.maximum(d['frames'] - 1, 0)
+    d['duplicated'] = d['interval'] < period / 2
+    d = d.loc[(d['trial'] >= 0) & (d['epoch'] != Epoch.other)]
+
+    # trials and epochs are contiguous runs of flips
+    run = np.cumsum(np.append(True, (np.diff(d['trial']) != 0) | (np.diff(d['epoch']) != 0)))
+    summary = (d.groupby(run)
+        .agg(
+            trial=('trial', 'first'),
+            epoch=('epoch', 'first'),
+            start=('time', 'first'),
+            n_flips=('time', 'size'),
+            duration=('interval', 'sum'),
+            frames=('frames', 'sum'),
+            dropped=('dropped', 'sum'),
+            duplicated=('duplicated', 'sum'),
+            max_interval=('interval', 'max'),
+            jitter=('interval', 'std'))
+        .reset_index(drop=True))
+
+    timed = np.array([expected_sec.get(Epoch(epoch)) is not None for epoch in summary['epoch']])
+    expected = np.array([
+        np.rint(expected_sec[Epoch(epoch)] / period) if is_timed else n
+        for epoch, n, is_timed in zip(summary['epoch'], summary['n_flips'], timed)])
+    summary.insert(summary.columns.get_loc('frames') + 1, 'expected_frames', expected)
+    summary['frame_error'] = summary['frames'] - summary['expected_frames']
+    # a timed epoch is a single flip held for many frames, so it only drops frames by overrunning
+    summary['dropped'] = np.where(timed, np.maximum(summary['frame_error'], 0), summary['dropped'])
+    summary['epoch'] = [Epoch(x).name for x in summary['epoch']]
+    return summary
+
+
+def histogram(flips: pd.DataFrame, period: float, epoch: Epoch = Epoch.dots) -> pd.DataFrame:
+    """Number of flips of an epoch by interval, in refresh periods."""
+    x = intervals(flips)[flips['epoch'].to_numpy() == epoch] / period
+    n, edges = np.histogram(x[~np.isnan(x)], bins=np.append(histogram_bins, np.inf))
+    return pd.DataFrame({'from_periods': edges[:-1], 'to_periods': edges[1:], 'n': n})
+
+
+def report(summary: pd.DataFrame, period: float) -> str:
+    dots = summary.loc[summary['epoch'] == Epoch.dots.name]
+    lines = [f'measured refresh period: {period * 1000:.3f} ms']
+    for epoch, d in summary.groupby('epoch', sort=False):
+        lines.append(
+            f'{epoch:>8}: {len(d)} trials, {int((d["frame_error"] != 0).sum())} off by a frame or more, '
+            f'{int(d["dropped"].sum())} dropped and {int(d["duplicated"].sum())} duplicated frames')
+    if len(dots):
+        lines.append(
+            f'dots lasted {dots["duration"].min() * 1000:.1f}-{dots["duration"].max() * 1000:.1f} ms, '
+            f'max interval {dots["max_interval"].max() * 1000:.1f} ms, '
+            f'median jitter {dots["jitter"].median() * 1000:.3f} ms')
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("frames", help="flip times saved by the experiment (.npz)")
+    parser.add_argument("-o", "--out", help="prefix of the csv files to write the report to", default=None)
+    args = parser.parse_args()
+
+    flips, nominal, expected_sec = load(args.frames)
+    period = measured_period(flips, nominal)
+    summary = summarize(flips, period, expected_sec)
+    print(report(summary, period))
+    if args.out:
+        summary.to_csv(f'{args.out}-trials.csv', index=False)
+        histogram(flips, period).to_csv(f'{args.out}-histogram.csv', index=False)
@@ -0,0 +1,151 @@
+"""Largest displayable chroma of every lightness and hue, for a monitor.
+
+Converting a color that is outside of the monitor's gamut silently clips it, so
+whether a set of (lightness, chroma, hue) colors can be shown as specified is only
+known by converting each of them. Instead, the boundary of the gamut is found once,
+for a dense grid of lightness x hue, by bisecting chroma for every point of the grid
+at once, and stored as a small table (stimuli/gamut-{key}.npz). The largest chroma
+of any lightness and hue is then interpolated from the table, so thousands of colors
+can be checked (in_gamut) or brought into gamut (clip) without converting them.
+
+The boundary assumes that every chroma below a displayable one is displayable too,
+and is accurate to the resolution of the grid.
+
+example:
+    python gamut.py --design stimuli/design.csv
+    python gamut.py --calibrated --lightness 90
+"""
+
+import argparse
+import os
+from typing import Callable, Tuple
+
+import numpy as np
+import pandas as pd
+
+from psychopy.tools import colorspacetools as cst
+
+from calibration import Calibration, asus_calibration, stimuli
+from colorcache import lch2lab
+
+# (start, stop, n) of lightness and hue (degrees, both ends included)
+lightness_grid = (0., 100., 401)
+hue_grid = (0., 360., 721)
+chroma_limit = 200.
+iterations = 24
+# rounding of the conversions, e.g. white converts to slightly above 1
+tolerance = 1e-3
+
+
+def default_in_gamut(lab: np.ndarray) -> np.ndarray:
+    """Whether each color is displayable on an sRGB monitor (psychopy's cielab2rgb)."""
+    with np.errstate(invalid='ignore'):
+        rgb = cst.cielab2rgb(lab.reshape(-1, 3), clip=False)
+        inside = np.all((rgb >= -1 - tolerance) & (rgb <= 1 + tolerance), axis=-1)
+    return inside.reshape(lab.shape[:-1])
+
+
+class CalibratedInGamut(object):
+    """Whether each color is displayable on a calibrated monitor."""
+
+    def __init__(self, calibration: Calibration):
+        self.calibration = calibration
+
+
+    def __call__(self, lab: np.ndarray) -> np.ndarray:
+        linear = self.calibration.lab2linear(lab)
+        return np.all((linear >= -tolerance) & (linear <= 1 + tolerance), axis=-1)
+
+
+def boundary(
+    in_gamut: Callable[[np.ndarray], np.ndarray],
+    lightness: np.ndarray,
+    hue: np.ndarray) -> np.ndarray:
+    """Largest displayable chroma of every lightness x hue, by bisection."""
+    lightness, hue = np.meshgrid(lightness, hue, indexing='ij')
+    low = np.zeros(lightness.shape)
+    high = np.full(lightness.shape, chroma_limit)
+    for _ in range(iterations):
+        middle = (low + high) / 2
+        inside = in_gamut(lch2lab(np.stack([lightness, middle, hue], axis=-1)))
+        low = np.where(inside, middle, low)
+        high = np.where(inside, high, middle)
+    return low
+
+
+class GamutTable(object):
+    """Largest displayable chroma, interpolated from a lightness x hue table."""
+
+    def __init__(self, table: np.ndarray, lightness: Tuple = lightness_grid, hue: Tuple = hue_grid):
+        self.table = table
+        self.lightness = lightness
+        self.hue = hue
+        self.lightness_step = (lightness[1] - lightness[0]) / (lightness[2] - 1)
+        self.hue_step = (hue[1] - hue[0]) / (hue[2] - 1)
+
+
+    def max_chroma(self, lightness, hue) -> np.ndarray:
+        """Bilinear interpolation of the table; hue wraps around."""
+        lightness = np.asarray(lightness, dtype=float)
+        hue = np.asarray(hue, dtype=float)
+        n_lightness, n_hue = self.table.shape
+        l = np.clip((lightness - self.lightness[0]) / self.lightness_step, 0, n_lightness - 1)
+        h = np.mod(hue - self.hue[0], 360) / self.hue_step
+        l0 = np.minimum(l.astype(int), n_lightness - 2)
+        h0 = np.minimum(h.astype(int), n_hue - 2)
+        wl = l - l0
+        wh = h - h0
+        t = self.table
+        return ((1 - wl) * ((1 - wh) * t[l0, h0] + wh * t[l0, h0 + 1])
+            + wl * ((1 - wh) * t[l0 + 1, h0] + wh * t[l0 + 1, h0 + 1]))
+
+
+    def in_gamut(self, lch: np.ndarray) -> np.ndarray:
+        """Whether each (lightness, chroma, hue) is displayable."""
+        lch = np.asarray(lch, dtype=float)
+        return lch[..., 1] <= self.max_chroma(lch[..., 0], lch[..., 2])
+
+
+    def clip(self, lch: np.ndarray) -> np.ndarray:
+        """The colors, with chroma reduced to the largest displayable one where needed."""
+        lch = np.array(lch, dtype=float)
+        lch[..., 1] = np.minimum(lch[..., 1], self.max_chroma(lch[..., 0], lch[..., 2]))
+        return lch
+
+
+def load(key: str, in_gamut: Callable, directory: str = stimuli) -> GamutTable:
+    """Load the table of a monitor, computing (and saving) it first if needed."""
+    path = os.path.join(directory, f'gamut-{key}.npz')
+    if os.path.exists(path):
+        with np.load(path) as f:
+            if tuple(f['lightness']) == lightness_grid and tuple(f['hue']) == hue_grid:
+                return GamutTable(f['table'])
+    table = boundary(in_gamut, np.linspace(*lightness_grid), np.linspace(*hue_grid)).astype(np.float32)
+    np.savez_compressed(path, table=table, lightness=lightness_grid, hue=hue_grid)
+    return GamutTable(table)
+
+
+def default_gamut(directory: str = stimuli) -> GamutTable:
+    return load('cielab2rgb', default_in_gamut, directory)
+
+
+def calibrated_gamut(calibration: Calibration, directory: str = stimuli) -> GamutTable:
+    return load(f'asus-{calibration.digest}', CalibratedInGamut(calibration), directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calibrated", help="the monitor's measured calibration, rather than sRGB", action='store_true', default=False)
+    parser.add_argument("--design", help="csv file (with lightness, chroma and hue) whose colors to check", default=None)
+    parser.add_argument("--lightness", help="print the largest chroma of every 10 degrees of hue at this lightness", type=float, default=None)
+    args = parser.parse_args()
+
+    gamut = calibrated_gamut(asus_calibration()) if args.calibrated else default_gamut()
+    if args.design:
+        colors = pd.read_csv(args.design)[['lightness', 'chroma', 'hue']].drop_duplicates()
+        colors['max_chroma'] = gamut.max_chroma(colors['lightness'], colors['hue'])
+        colors['in_gamut'] = gamut.in_gamut(colors[['lightness', 'chroma', 'hue']].to_numpy())
+        print(colors.to_string(index=False))
+    if args.lightness is not None:
+        hue = np.arange(0, 360, 10)
+        print(pd.DataFrame({'hue': hue, 'max_chroma': gamut.max_chroma(args.lightness, hue)}).to_string(index=False))
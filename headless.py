@@ -0,0 +1,273 @@
+"""Run the experiment without a display, a GPU or an iohub server.
+
+headless_backend() stands in for main.psychopy_backend(): the window's flip() advances
+a virtual clock by one refresh period and returns it, stimuli only remember their
+attributes, and iohub is replaced by an object that keeps the trial records and
+messages it is sent. Waiting for "c" returns at once, and the presses during the
+dots are taken from a list of responses, one per trial, so a whole session runs as
+fast as the trial loop allows while producing the same trial records.
+
+Responses are (key, seconds after the dots appeared), or None for no response. They
+can be scripted, or simulated with simulated_responses().
+
+example:
+    python headless.py --sub 3 --out records.csv
+"""
+
+import argparse
+import timeit
+from types import SimpleNamespace
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from schedule import Cue, Schedule
+from scoring import LEFT, RIGHT, boundary_direction, boundary_hue, color_cues
+
+Response = Optional[Tuple[str, float]]
+
+
+class VirtualClock(object):
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+
+    def advance(self, sec: float) -> None:
+        self.now += sec
+
+
+    def advance_to(self, time: float) -> None:
+        self.now = max(self.now, time)
+
+
+class Stim(object):
+    """Any stimulus: keeps whatever it is given, and draws nothing."""
+
+    def __init__(self, *args, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+    def draw(self) -> None:
+        pass
+
+
+    def precomputeTrajectory(self, nFrames: int) -> None:
+        pass
+
+
+    def playTrajectory(self, frames) -> None:
+        pass
+
+
+class Window(Stim):
+
+    def __init__(self, clock: VirtualClock, refresh_rate: float, **kwargs):
+        super().__init__(**kwargs)
+        self.clock = clock
+        self.monitorFramePeriod = 1 / refresh_rate
+
+
+    def flip(self) -> float:
+        self.clock.advance(self.monitorFramePeriod)
+        return self.clock.now
+
+
+    def setMouseVisible(self, visibility: bool) -> None:
+        pass
+
+
+    def close(self) -> None:
+        pass
+
+
+class StaticPeriod(object):
+    """Like psychopy's, ends a frame early so that the next flip is on time."""
+
+    def __init__(self, clock: VirtualClock, screenHz: Optional[float] = None):
+        self.clock = clock
+        self.frame_sec = 1 / screenHz if screenHz else 0.0
+        self.end = clock.now
+
+
+    def start(self, duration: float) -> None:
+        self.end = self.clock.now + duration - self.frame_sec
+
+
+    def complete(self) -> int:
+        self.clock.advance_to(self.end)
+        return 1
+
+
+class Keyboard(object):
+    """Presses whatever is being waited for, after wait_sec."""
+
+    def __init__(self, clock: VirtualClock, wait_sec: float):
+        self.clock = clock
+        self.wait_sec = wait_sec
+
+
+    def waitForPresses(self, keys: Sequence[str]) -> List[SimpleNamespace]:
+        self.clock.advance(self.wait_sec)
+        return [SimpleNamespace(key=keys[0], time=self.clock.now)]
+
+
+    def getPresses(self, keys: Sequence[str]) -> List[SimpleNamespace]:
+        # only used by the instructions, which wait for the first of keys
+        return [SimpleNamespace(key=keys[0], time=self.clock.now)]
+
+
+class IO(object):
+    """Keeps what an iohub datastore would."""
+
+    def __init__(self, clock: VirtualClock, wait_sec: float):
+        self.clock = clock
+        self.devices = SimpleNamespace(keyboard=Keyboard(clock, wait_sec))
+        self.columns: List[str] = []
+        self.records: List[dict] = []
+        self.messages: List[Tuple[float, str, str]] = []
+
+
+    def createTrialHandlerRecordTable(self, trials) -> None:
+        self.columns = list(trials.trialList[0].keys())
+
+
+    def addTrialHandlerRecord(self, trial: dict) -> None:
+        self.records.append({c: trial[c] for c in self.columns})
+
+
+    def sendMessageEvent(self, text: str, category: str = '', offset: float = 0.0, sec_time: Optional[float] = None) -> bool:
+        self.messages.append((self.clock.now if sec_time is None else sec_time, category, text))
+        return True
+
+
+    def clearEvents(self) -> None:
+        pass
+
+
+    def quit(self) -> None:
+        pass
+
+
+    def trial_records(self) -> pd.DataFrame:
+        return pd.DataFrame(self.records, columns=self.columns)
+
+
+class KeyboardListener(object):
+    """Gives the next response each time it is armed, once its time has come."""
+
+    def __init__(self, clock: VirtualClock, responses: List[Response]):
+        self.clock = clock
+        self.responses = responses
+        self.n_armed = 0
+        self.response: Response = None
+        self.dots_start: Optional[float] = None
+
+
+    def arm(self, keys: Sequence[str]) -> None:
+        self.response = self.responses[self.n_armed] if self.n_armed < len(self.responses) else None
+        self.n_armed += 1
+        self.dots_start = None
+
+
+    def poll(self) -> List[SimpleNamespace]:
+        # the first poll is just after the first flip of the dots
+        if self.dots_start is None:
+            self.dots_start = self.clock.now
+        if self.response is None:
+            return []
+        key, rt = self.response
+        if self.clock.now < self.dots_start + rt:
+            return []
+        self.response = None
+        return [SimpleNamespace(key=key, time=self.dots_start + rt)]
+
+
+    def disarm(self) -> None:
+        pass
+
+
+    def stop(self) -> None:
+        pass
+
+
+def headless_backend(
+    responses: Optional[List[Response]] = None,
+    refresh_rate: float = 60,
+    wait_sec: float = 1.0) -> SimpleNamespace:
+    """Everything Experiment needs from main.psychopy_backend(), on a virtual clock.
+
+    responses (one per trial, in order) can also be added to backend.responses after
+    the backend is made, e.g. once the experiment's schedule exists. wait_sec is how
+    long each wait for "c" takes.
+    """
+    clock = VirtualClock()
+    responses = [] if responses is None else responses
+    return SimpleNamespace(
+        clock=clock,
+        responses=responses,
+        Window=lambda **kwargs: Window(clock, refresh_rate, **kwargs),
+        Monitor=Stim,
+        Circle=Stim,
+        Polygon=Stim,
+        Line=Stim,
+        ShapeStim=Stim,
+        TextStim=Stim,
+        WrappedDot=Stim,
+        deg2pix=lambda deg, monitor: deg,
+        StaticPeriod=lambda **kwargs: StaticPeriod(clock, **kwargs),
+        launchHubServer=lambda **kwargs: IO(clock, wait_sec),
+        KeyboardListener=lambda io: KeyboardListener(clock, responses))
+
+
+def simulated_responses(
+    schedule: Schedule,
+    seed: int = 0,
+    slope_deg: float = 10.0,
+    lapse: float = 0.02,
+    rt_median_sec: float = 0.7,
+    rt_sd_log: float = 0.3,
+    max_rt_sec: float = 3.0) -> List[Response]:
+    """Responses of a simulated participant.
+
+    The log odds of the correct answer grow by one for every slope_deg degrees the hue
+    (or direction) is from the category boundary, and with probability lapse the key is
+    a guess. Response times are lognormal, and longer than max_rt_sec (the dots) means
+    no response.
+    """
+    rng = np.random.default_rng(seed)
+    is_color = np.isin(schedule.cue, [Cue[x] for x in color_cues])
+    distance = np.abs(np.where(is_color, schedule.hue - boundary_hue, schedule.direction - boundary_direction))
+    p_correct = (1 - lapse) / (1 + np.exp(-distance / slope_deg)) + lapse / 2
+    correct = rng.random(schedule.n_trials) < p_correct
+    # trials without a right answer are guesses
+    guess = rng.random(schedule.n_trials) < 0.5
+    right = np.where(
+        schedule.expected_key == RIGHT, correct,
+        np.where(schedule.expected_key == LEFT, ~correct, guess))
+    rt = rt_median_sec * np.exp(rng.normal(0, rt_sd_log, schedule.n_trials))
+    return [('right' if r else 'left', t) if t < max_rt_sec else None for r, t in zip(right, rt)]
+
+
+if __name__ == "__main__":
+    from main import Experiment
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sub", help="subject whose design to run", type=int, default=0)
+    parser.add_argument("--seed", help="seed of the simulated participant", type=int, default=0)
+    parser.add_argument("--out", help="csv file to write the trial records to", default=None)
+    args = parser.parse_args()
+
+    backend = headless_backend()
+    start = timeit.default_timer()
+    experiment = Experiment(sub=args.sub, backend=backend)
+    backend.responses.extend(simulated_responses(experiment.schedule, seed=args.seed, max_rt_sec=experiment.dot_sec))
+    experiment.run()
+    elapsed = timeit.default_timer() - start
+
+    records = experiment.io.trial_records()
+    print(f'{len(records)} trials ({backend.clock.now / 60:.0f} min of session) in {elapsed:.2f} s, '
+          f'{records["correct"].mean():.0%} correct')
+    if args.out:
+        records.to_csv(args.out, index=False)
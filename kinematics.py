@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Update rule for the dots of a `WrappedDot` field.
+
+This is kept free of any psychopy / OpenGL imports so that the dots can be
+moved (and timed) without a window.
+"""
+
+import numpy as np
+
+# some constants
+_2pi = 2 * np.pi
+
+
+class RandomPool(object):
+    """Uniform random numbers from a seeded `numpy.random.Generator`, drawn
+    in large blocks and handed out as slices of the block.
+
+    Drawing thousands of numbers at once is much cheaper per number than the
+    many small draws the dots make, and as every number comes from one
+    stream, in the order it is asked for, the numbers only depend on the seed
+    (not on the size of the blocks).
+
+    Parameters
+    ----------
+    seed : int
+        Seed of the generator.
+    blockSize : int
+        Number of values drawn at once.
+
+    """
+    def __init__(self, seed, blockSize=1 << 16):
+        self.seed = seed
+        self.generator = np.random.default_rng(seed)
+        self._block = np.empty(blockSize)
+        self._next = blockSize
+
+    def random(self, n):
+        """`n` uniform numbers in [0, 1).
+
+        The result is a view onto the pool, which is overwritten once the
+        pool is refilled, so it should be used (or copied) before the next
+        call.
+        """
+        if self._next + n > len(self._block):
+            # the rest of the block is used first, so the stream is the same
+            # whatever the block size
+            rest = self._block[self._next:].copy()
+            if len(self._block) < n:
+                self._block = np.empty(n)
+            self._block[:len(rest)] = rest
+            self.generator.random(out=self._block[len(rest):])
+            self._next = 0
+        out = self._block[self._next:self._next + n]
+        self._next += n
+        return out
+
+
+def _globalBitGenerator():
+    """The bit generator behind numpy's global random state.
+
+    `numpy.random.get_bit_generator` is only in numpy >= 1.25; before that (back
+    to 1.17, which introduced bit generators) it is the global RandomState's.
+    """
+    if hasattr(np.random, 'get_bit_generator'):
+        return np.random.get_bit_generator()
+    return np.random.mtrand._rand._bit_generator
+
+
+class GlobalRandom(object):
+    """Uniform random numbers from numpy's global random state, written into
+    a buffer that is reused from call to call.
+
+    The numbers are the same, in the same order, as those of
+    `numpy.random.random_sample`, so `numpy.random.seed` still applies, but
+    no new array is allocated for each call.
+
+    """
+    def __init__(self):
+        self._block = np.empty(0)
+        self._generator = None
+
+    def random(self, n):
+        """`n` uniform numbers in [0, 1).
+
+        The result is a view onto the buffer, which is overwritten by the
+        next call, so it should be used (or copied) before then.
+        """
+        if len(self._block) < n:
+            self._block = np.empty(n)
+        bitGenerator = _globalBitGenerator()
+        if self._generator is None or self._generator.bit_generator is not bitGenerator:
+            self._generator = np.random.Generator(bitGenerator)
+        out = self._block[:n]
+        self._generator.random(out=out)
+        return out
+
+
+def newDotsXY(nDots, fieldShape, fieldSize, rand=np.random.random_sample):
+    """Uniform spread of `nDots` positions over a field.
+
+    Parameters
+    ----------
+    nDots : int
+        Number of dots to sample.
+    fieldShape : str
+        'circle' or 'sqr'.
+    fieldSize : array_like
+        Width and height of the field.
+    rand : callable
+        Source of uniform random numbers in [0, 1), called with a number of
+        values, e.g. `RandomPool.random`. Defaults to the global numpy state.
+
+    Returns
+    -------
+    ndarray
+        Nx2 array of X and Y positions of dots.
+
+    """
+    if fieldShape == 'circle':
+        length = np.sqrt(rand(nDots))
+        angle = rand(nDots) * _2pi
+
+        newDots = np.zeros((nDots, 2))
+        newDots[:, 0] = length * np.cos(angle)
+        newDots[:, 1] = length * np.sin(angle)
+
+        newDots *= fieldSize * .5
+    else:
+        newDots = (rand(nDots * 2).reshape(nDots, 2) - 0.5) * fieldSize
+
+    return newDots
+
+
+class DotKinematics(object):
+    """Positions and directions of a field of dots, along with the scratch
+    space needed to move them without allocating new arrays on every frame.
+
+    Signal dots are always the leading `nSignal` dots, so they (and the noise
+    dots) can be addressed with slices instead of boolean masks.
+
+    Attributes
+    ----------
+    xy : ndarray
+        Nx2 array of dot positions, in field units, relative to the centre of
+        the field. Updated in place by `step`.
+    dirs : ndarray
+        Direction of each dot, in radians. Call `updateVelocities` after
+        changing these.
+    vel : ndarray
+        Nx2 array of unit vectors pointing in the direction of each dot. This
+        is a cache of ``cos(dirs), sin(dirs)``.
+    dead : ndarray
+        Boolean array flagging dead dots.
+    rand : callable
+        Source of the uniform random numbers of the 'walk' noise, see
+        `newDotsXY`. Defaults to the global numpy state, through a
+        `GlobalRandom` buffer.
+
+    """
+    def __init__(self, nDots):
+        self.nDots = nDots
+        self.xy = np.zeros((nDots, 2))
+        self.dirs = np.zeros(nDots)
+        self.vel = np.zeros((nDots, 2))
+        self.dead = np.zeros(nDots, dtype=bool)
+
+        # scratch space
+        self._step = np.empty((nDots, 2))
+        self._beyond = np.empty(nDots)
+        self._sign = np.empty(nDots)
+        # column views, made once so that step() does not create them
+        self._x = self.xy[:, 0]
+        self._y = self.xy[:, 1]
+        self._cos = self.vel[:, 0]
+        self._sin = self.vel[:, 1]
+        self._stepX = self._step[:, 0]
+        self._stepY = self._step[:, 1]
+
+        self.nSignal = 0
+        self.rand = GlobalRandom().random
+
+    @property
+    def nSignal(self):
+        """int. Number of signal dots (the first `nSignal` of the field)."""
+        return self._nSignal
+
+    @nSignal.setter
+    def nSignal(self, nSignal):
+        self._nSignal = int(nSignal)
+        # views onto the signal and noise blocks
+        self._signalXY = self.xy[:self._nSignal]
+        self._signalVel = self.vel[:self._nSignal]
+        self._signalStep = self._step[:self._nSignal]
+        self._noiseDirs = self.dirs[self._nSignal:]
+        self._noiseCos = self.vel[self._nSignal:, 0]
+        self._noiseSin = self.vel[self._nSignal:, 1]
+        self._noiseDead = self.dead[self._nSignal:]
+
+    def updateVelocities(self):
+        """Recompute the cached unit vectors from `dirs`."""
+        np.cos(self.dirs, out=self._cos)
+        np.sin(self.dirs, out=self._sin)
+
+    def step(self, speed, radius, noiseDots='direction'):
+        """Move every dot by one frame.
+
+        Dots which leave the (circular) field are reflected through the
+        centre and pushed back in by as far as they overshot.
+
+        Parameters
+        ----------
+        speed : float or ndarray
+            Distance each dot travels per frame, in field units. An Nx2 array
+            (the speed twice, for X and Y) gives the speed of each dot.
+        radius : float or ndarray
+            Radius of the field, in field units. An array of N gives the
+            radius of each dot's field.
+        noiseDots : str
+            'direction', 'position' or 'walk'. See `WrappedDot.noiseDots`.
+
+        """
+        xy = self.xy
+        step = self._step
+        beyond = self._beyond
+
+        # update the locations of signal and noise; 0 radians=East!
+        if noiseDots == 'walk':
+            # noise dots take a new direction on every frame
+            self._noiseDirs[:] = self.rand(self.nDots - self.nSignal)
+            self._noiseDirs *= _2pi
+            np.cos(self._noiseDirs, out=self._noiseCos)
+            np.sin(self._noiseDirs, out=self._noiseSin)
+            np.multiply(self.vel, speed, out=step)
+            xy += step
+        elif noiseDots == 'direction':
+            # simply use the stored directions to update position
+            np.multiply(self.vel, speed, out=step)
+            xy += step
+        elif noiseDots == 'position':
+            # only signal dots move, noise dots are flagged as dead
+            if np.ndim(speed):
+                speed = speed[:self._nSignal]
+            np.multiply(self._signalVel, speed, out=self._signalStep)
+            self._signalXY += self._signalStep
+            self._noiseDead.fill(True)
+
+        # handle boundaries of the field
+        np.multiply(xy, xy, out=step)
+        np.add(self._stepX, self._stepY, out=beyond)
+        np.sqrt(beyond, out=beyond)
+        beyond -= radius
+        np.maximum(beyond, 0, out=beyond)
+        # reflect those vertices which are beyond the boundary (a sign of -1
+        # for those dots, +1 for the rest)
+        np.sign(beyond, out=self._sign)
+        self._sign *= -2
+        self._sign += 1
+        np.multiply(self._x, self._sign, out=self._x)
+        np.multiply(self._y, self._sign, out=self._y)
+        # push the dot back to the boundary (beyond once), then through the
+        # boundary based on how far it overshot (beyond twice)
+        beyond *= 2
+        np.multiply(self._cos, beyond, out=self._stepX)
+        np.multiply(self._sin, beyond, out=self._stepY)
+        xy += step
@@ -4,38 +4,80 @@
 # - add colors (true cielab requires info about monitor -- and info not specified in paper)
 # - change display backed to pyglfw (to enable setting refresh rate)
 # - gamma?
-# - check that trial['dots_end'] and trial['fix_start'] are 1 refresh cycle apart
 # - annex data
 # - eyetracking
 
 # notes to be careful about:
 # - pylink install is manual. that is, it's downloaded from sr-research site, unpacked
 #   and then put into psychopy/lib/python3.6/site-packages/pylink
+# - numpy must be at least 1.17 (for numpy.random.Generator, used to draw the dots and
+#   designs), which the python3.6 psychopy install has
 
 
 import argparse
-import pickle
 import os
 import math
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import TextIO, Tuple, List, Optional
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, TextIO, Tuple, List, Optional
 import sys
 from platform import node
 
 import numpy as np
 import pandas as pd
-import git
 
-from psychopy import core, visual, data, clock, monitors
-from psychopy.info import RunTimeInfo
-from psychopy.iohub.client import ioHubConnection
-from psychopy.iohub.client.connect import launchHubServer
-from psychopy.tools import colorspacetools as cst
-from psychopy.tools.monitorunittools import deg2pix
-from psychopy.gui import Dlg
-from psychopy.visual.text import TextStim
-
-from dot import WrappedDot
+from psychopy import core, clock, logging
+from psychopy.colors import Color
+
+from calibration import asus_calibration
+from colorcache import ColorCache, default_lab2rgb, lch2lab
+from designstore import DesignStore, build, is_current
+from fliplog import FlipLog
+from gamut import calibrated_gamut, default_gamut
+from frametiming import Epoch, FrameTimes, histogram, measured_period, report, summarize
+from responses import KeyboardListener
+from runinfo import save as save_runinfo, start_system_info, window_info
+from schedule import Cue, Schedule
+from scoring import is_correct
+from startup import PhaseTimer
+from version import version
+
+if TYPE_CHECKING:
+    from psychopy import visual
+    from psychopy.iohub.client import ioHubConnection
+
+
+def psychopy_backend() -> SimpleNamespace:
+    """Window, stimuli and devices of a real session.
+
+    Imported here rather than at the top, since they need a display (and wx for the
+    dialogs), so that the experiment can also run with headless.headless_backend.
+    """
+    from psychopy import visual, monitors
+    from psychopy.iohub.client.connect import launchHubServer
+    from psychopy.tools.monitorunittools import deg2pix
+
+    from dot import WrappedDot
+
+    return SimpleNamespace(
+        Window=visual.Window,
+        Monitor=monitors.Monitor,
+        Circle=visual.Circle,
+        Polygon=visual.Polygon,
+        Line=visual.Line,
+        ShapeStim=visual.ShapeStim,
+        TextStim=visual.TextStim,
+        WrappedDot=WrappedDot,
+        deg2pix=deg2pix,
+        StaticPeriod=clock.StaticPeriod,
+        launchHubServer=launchHubServer,
+        KeyboardListener=KeyboardListener)
+
+
+# out-of-gamut colors already warned about, with the conversion they were found with,
+# so that making many Experiments in one process (e.g. benchmarks) warns once per design
+warned_gamut = set()
 
 
 class Experiment(object):
@@ -57,48 +99,119 @@ class Experiment(object):
     feedback_sec = 0.5
 
     initial_pause_sec = 0.5
+    # how long each epoch of a trial should last (None: one frame per flip)
+    expected_epoch_sec = {
+        Epoch.fix: fix_sec,
+        Epoch.cue: cue_sec,
+        Epoch.dots: None,
+        Epoch.feedback: feedback_sec}
 
     def __init__(
         self, 
         no_demographics = False, 
-        task = 'test'):        
+        task = 'test',
+        calibrated = False,
+        sub: int = 0,
+        backend: Optional[SimpleNamespace] = None):        
         
-        if task=='main':
-            self.sub = self.solicit_subid()
-            demographics = self.solicit_demographics(no_demographics)            
-            iohub_config = {
-                'experiment_code': 'color',
-                'datastore_name': node(),
-                'session_code': task,
-                'experiment_info': {
-                    'version': str(git.repo.fun.rev_parse(git.Repo(), 'HEAD'))[0:6]},
-                'session_info': {
-                'user_variables': {
-                    'date': datetime.now().strftime("%d-%m-%Y_%H-%M-%S"),
-                    'sub': self.sub,
-                    'sex': demographics[0],
-                    'ethnicity': demographics[1],
-                    'race': demographics[2],
-                    'age': demographics[3]}}}
-        else:
-            iohub_config = {}
-            self.sub = 0
+        self.startup = PhaseTimer()
+        self.task = task
+        # the design (with its colors) and the iohub server are prepared on other threads,
+        # while the dialogs, window and stimuli are made on this one
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix='startup') as pool:
+            if task=='main':
+                # before any dialog, so that a copy without a version stops here
+                experiment_version = version()
+                with self.startup.phase('subject'):
+                    self.sub = self.solicit_subid()
+                # the session's log, with the startup and frame timing reports
+                logging.LogFile(
+                    os.path.join('data-raw', f'sub-{self.sub}_task-{task}.log'),
+                    level=logging.EXP,
+                    filemode='a')
+                # profiling the system is slow, so it runs in another process and is
+                # collected once the welcome screen is up
+                self.system_info = start_system_info(verbose=True, userProcsDetailed=True)
+            else:
+                self.sub = sub
+            trialdf = pool.submit(self.startup.timed('design', self.__prep_design), calibrated)
+
+            if task=='main':
+                with self.startup.phase('demographics'):
+                    demographics = self.solicit_demographics(no_demographics)
+                iohub_config = {
+                    'experiment_code': 'color',
+                    'datastore_name': node(),
+                    'session_code': task,
+                    'experiment_info': {
+                        'version': experiment_version},
+                    'session_info': {
+                    'user_variables': {
+                        'date': datetime.now().strftime("%d-%m-%Y_%H-%M-%S"),
+                        'sub': self.sub,
+                        'sex': demographics[0],
+                        'ethnicity': demographics[1],
+                        'race': demographics[2],
+                        'age': demographics[3]}}}
+            else:
+                iohub_config = {}
 
-        self.trialdf = self.__prep_df(os.path.join('stimuli','design.csv'))
+            # psychopy and iohub, unless simulating a session (see headless.py)
+            with self.startup.phase('imports'):
+                self.backend = psychopy_backend() if backend is None else backend
+            io = pool.submit(self.startup.timed('iohub', self.backend.launchHubServer), **iohub_config)
 
-        self.io = iohub_config
+            with self.startup.phase('stimuli'):
+                self.__prep_stimuli()
+
+            if task == 'main':
+                # the refresh test needs the window, so it stays on this thread
+                with self.startup.phase('refresh'):
+                    self.window_info = window_info(self.win)
+
+            self.trialdf = trialdf.result()
+            self.schedule = Schedule(self.trialdf)
+            self.io = io.result()
 
         # Inform the ioHub server about the TrialHandler
         # randomization already done (hence 'sequential')
-        self.io.createTrialHandlerRecordTable(data.TrialHandler(
+        from psychopy.data import TrialHandler
+        self.io.createTrialHandlerRecordTable(TrialHandler(
             [x for x in (self.trialdf.T.to_dict()).values()], 
             nReps=1,
             method='sequential')) 
 
-        self.mon = monitors.Monitor("default", distance=60.96)
+        self.flip_log = FlipLog(self.n_flips_per_dots)
+        self.frame_times = FrameTimes(self.schedule.n_trials * (self.n_flips_per_dots + 3) + 1000)
+
+
+    def __prep_design(self, calibrated: bool) -> pd.DataFrame:
+        # how colors are converted from CIELAB. the calibrated conversion uses the profile
+        # measured for the lab's monitor, the default assumes an sRGB display
+        if calibrated:
+            calibration = asus_calibration()
+            self.lab2rgb = calibration.lab2rgb
+            self.lab2rgb_key = f'asus-{calibration.digest}'
+            self.gamut = calibrated_gamut(calibration)
+        else:
+            self.lab2rgb = default_lab2rgb
+            self.lab2rgb_key = 'cielab2rgb-clip'
+            self.gamut = default_gamut()
+
+        # the dots of every trial, if they were generated before the session
+        from trajectorycache import load as load_trajectories
+        self.trajectories = load_trajectories(self.sub)
+
+        return self.__prep_df(
+            os.path.join('stimuli', 'design.csv'),
+            os.path.join('stimuli', 'design-store'))
+
+
+    def __prep_stimuli(self) -> None:
+        self.mon = self.backend.Monitor("default", distance=60.96)
 
         # create a window to draw in
-        self.win = visual.Window(
+        self.win = self.backend.Window(
             size=(1920, 1080),
             fullscr=True,
             allowGUI=False,
@@ -110,37 +223,38 @@ class Experiment(object):
             # gamma = [r.gamma, g.gamma, b.gamma],
             color='black')
 
-        if task == 'main':
-            runinfo = RunTimeInfo(verbose=True, userProcsDetailed=True, win=self.win, refreshTest=True)
-            with open(os.path.join('data-raw', f'sub-{self.sub}_task-{task}_runinfo.pkl'), 'xb') as f:pickle.dump(runinfo, f)
-
-        self.fix = visual.Circle(win=self.win, radius=self.fix_radius, size=1, fillColor="white")
+        self.fix = self.backend.Circle(win=self.win, radius=self.fix_radius, size=1, fillColor="white")
 
         # cues for color
-        self.triangle = visual.Polygon(win=self.win, radius=self.radius, lineColor="gray", lineWidth=self.linewidth)
-        self.circle = visual.Circle(win=self.win, radius=self.radius, lineColor="gray", lineWidth=self.linewidth)
+        self.triangle = self.backend.Polygon(win=self.win, radius=self.radius, lineColor="gray", lineWidth=self.linewidth)
+        self.circle = self.backend.Circle(win=self.win, radius=self.radius, lineColor="gray", lineWidth=self.linewidth)
 
         # cues for direction
-        self.line1 = visual.Line(win=self.win, lineWidth=self.linewidth, start=(-math.sqrt(3)/2, math.sqrt(3)/2), 
+        self.line1 = self.backend.Line(win=self.win, lineWidth=self.linewidth, start=(-math.sqrt(3)/2, math.sqrt(3)/2), 
             end=(math.sqrt(3)/2, -math.sqrt(3)/2), lineColor="gray", size=self.radius)
-        self.line2 = visual.Line(win=self.win, lineWidth=self.linewidth, start=(-math.sqrt(3)/2, -math.sqrt(3)/2), 
+        self.line2 = self.backend.Line(win=self.win, lineWidth=self.linewidth, start=(-math.sqrt(3)/2, -math.sqrt(3)/2), 
             end=(math.sqrt(3)/2, math.sqrt(3)/2), lineColor="gray", size=self.radius)
-        self.fleur = visual.ShapeStim(win=self.win, size=self.radius, lineColor="gray", lineWidth=self.linewidth, vertices=self.__make_vertices())
-
-        self.dots = WrappedDot(
+        self.fleur = self.backend.ShapeStim(win=self.win, size=self.radius, lineColor="gray", lineWidth=self.linewidth, vertices=self.__make_vertices())
+        self.cues = {
+            Cue.triangle: [self.triangle],
+            Cue.circle: [self.circle],
+            Cue.cross: [self.line1, self.line2],
+            Cue.fleur: [self.fleur]}
+
+        self.dots = self.backend.WrappedDot(
             win=self.win,
             units='deg',
             fieldShape="circle",
-            dotSize=deg2pix(self.dotsize_deg, self.mon),
+            dotSize=self.backend.deg2pix(self.dotsize_deg, self.mon),
             dotLife=-1,
             coherence=self.dot_coherence,
             nDots=self.ndots,
             fieldSize=self.dotfield_diameter_deg,
             speed=self.dot_speed_deg_per_sec / self.refresh_rate)
 
-        self.correct = TextStim(self.win, text = "CORRECT", color="green")
-        self.incorrect = TextStim(self.win, text = "INCORRECT", color="red")
-        self.welcome = TextStim(self.win, text=
+        self.correct = self.backend.TextStim(self.win, text = "CORRECT", color="green")
+        self.incorrect = self.backend.TextStim(self.win, text = "INCORRECT", color="red")
+        self.welcome = self.backend.TextStim(self.win, text=
         '''
         welcome to the experiment
 
@@ -148,22 +262,22 @@ class Experiment(object):
         ''',
         wrapWidth=50,
         alignText="left")
-        self.rest = TextStim(
+        self.rest = self.backend.TextStim(
             self.win,
             pos=(0, 6),
             alignText="left",
             wrapWidth=50)
 
-        self.waiter = clock.StaticPeriod(screenHz=self.refresh_rate)
+        self.waiter = self.backend.StaticPeriod(screenHz=self.refresh_rate)
 
     
     @property
-    def win(self) -> visual.Window:
+    def win(self) -> "visual.Window":
         return self.__win
 
     
     @win.setter
-    def win(self, win: visual.Window) -> None:
+    def win(self, win: "visual.Window") -> None:
         self.__win = win
 
     
@@ -173,10 +287,12 @@ class Experiment(object):
         del self.__win
 
 
-    def __prep_df(self, design: TextIO) -> pd.DataFrame:
-        d = pd.read_csv(design)
-                
-        d_sub = (d.loc[d['sub']==self.sub]
+    def __prep_df(self, design: TextIO, store: str) -> pd.DataFrame:
+        # only this subject's rows are read, from a store converted from the csv
+        if not is_current(store, design):
+            build([design], store)
+
+        d_sub = (DesignStore(store).subject(self.sub)
             .sort_values(by=['block','trial'])
             .assign(
                 fix_start = float('NaN'),
@@ -189,15 +305,29 @@ class Experiment(object):
                 response_key = '',
                 a = lambda x: x.chroma * np.cos(np.radians(x.hue)),
                 b = lambda x: x.chroma * np.sin(np.radians(x.hue)),
-                rgb = lambda x: cst.cielab2rgb(
-                    x.loc[:,['lightness','a','b']],
-                    # whiteXYZ=[0.9642, 1.0, 0.8521],
-                    # conversionMatrix=rgb2xyz, 
-                    clip=True).tolist()))
-        d_sub['R'] = [x[0] for x in d_sub['rgb']]
-        d_sub['G'] = [x[1] for x in d_sub['rgb']]
-        d_sub['B'] = [x[2] for x in d_sub['rgb']]
-        return d_sub.drop('rgb', axis=1)
+                # each trial's dots are drawn from their own seed, so any trial's
+                # stimulus can be regenerated from its record
+                dots_seed = lambda d: np.random.default_rng().integers(2**31, size=len(d))))
+        if self.trajectories is not None:
+            self.trajectories.check(d_sub)
+            d_sub['dots_seed'] = self.trajectories.dots_seed
+        # colors the monitor can not show are clipped when converted
+        outside = ~self.gamut.in_gamut(d_sub.loc[:, ['lightness', 'chroma', 'hue']].to_numpy())
+        if outside.any():
+            colors = d_sub.loc[outside, ['lightness', 'chroma', 'hue']].drop_duplicates()
+            key = (self.lab2rgb_key, tuple(map(tuple, colors.to_numpy())))
+            if key not in warned_gamut:
+                warned_gamut.add(key)
+                hues = ', '.join(f'{x:g}' for x in np.unique(colors['hue']))
+                logging.warning(f"the design has colors outside of the monitor's gamut (hue {hues}), which are clipped")
+        # only a few distinct colors, which are converted once and then cached on disk
+        rgb, index = ColorCache(
+            os.path.join('stimuli', 'design-colors.npz'), 
+            lab2rgb=self.lab2rgb, 
+            key=self.lab2rgb_key).convert(
+            d_sub.loc[:, ['lightness', 'chroma', 'hue']].to_numpy())
+        d_sub['R'], d_sub['G'], d_sub['B'] = rgb[index].T
+        return d_sub
 
 
     @property
@@ -211,20 +341,22 @@ class Experiment(object):
 
 
     @property
-    def io(self) -> ioHubConnection:
+    def io(self) -> "ioHubConnection":
         return self.__io
 
 
     @io.setter
-    def io(self, iohub_config: dict) -> None:
-        # Start the ioHub process. 'io' can now be used during the
+    def io(self, io: "ioHubConnection") -> None:
+        # the connection to a started ioHub process. 'io' can now be used during the
         # # experiment to access iohub devices and read iohub device events.
-        io = launchHubServer(**iohub_config)
         self.__io = io
+        # presses during the dots are collected in the background
+        self.keyboard = self.backend.KeyboardListener(io)
 
 
     @io.deleter
     def io(self) -> None:
+        self.keyboard.stop()
         self.__io.quit()
         del self.__io
 
@@ -232,6 +364,8 @@ class Experiment(object):
     @staticmethod
     def solicit_demographics(no_demographics) -> Tuple[str, str, str, str]:
 
+        from psychopy.gui import Dlg
+
         dlg = Dlg(title="Demographics")
         dlg.addText('''The National Institute of Health requests basic demographic information (sex, ethnicity, race, and age)
         for clinical or behavioral studies, to the extent that this information is provided by research participants.
@@ -257,6 +391,8 @@ class Experiment(object):
     @staticmethod
     def solicit_subid() -> int:
 
+        from psychopy.gui import Dlg
+
         dlg = Dlg(title="Participant")
         dlg.addField('ID:', choices=[x for x in range(0, 31)])
         ID = dlg.show()        
@@ -289,21 +425,22 @@ class Experiment(object):
         return vertices
 
 
-    def __drawcue(self, shape) -> None:
-        if shape == 'triangle':
-            self.triangle.draw()
-        elif shape == 'cross':
-            self.line1.draw()
-            self.line2.draw()
-        elif shape == 'circle':
-            self.circle.draw()
-        else: 
-            self.fleur.draw()
+    def __drawcue(self, cue: Cue) -> None:
+        self.draw_list(self.cues[cue])
 
 
-    def __prep_dots(self, direction: float, rgb: Tuple[float, float, float]) -> None:
-        self.dots.dir = direction
-        self.dots.color = rgb
+    def __prep_dots(self, i: int) -> None:
+        if self.trajectories is None:
+            self.dots.seed = self.schedule.dots_seed[i]
+        self.dots.dir = self.schedule.direction[i]
+        self.dots.color = self.schedule.color[i]
+        if self.trajectories is not None:
+            # precomputed for the session, and drawn straight from the file
+            self.dots.playTrajectory(self.trajectories.trial(i))
+        else:
+            # generate the whole dots epoch now, while waiting on the fixation period,
+            # so that no kinematics happen during the stimulus flips
+            self.dots.precomputeTrajectory(self.n_flips_per_dots)
 
 
     @property
@@ -320,18 +457,41 @@ class Experiment(object):
             self.__presses = presses
     
 
+    def __flip(self, epoch: Epoch = Epoch.other, trial: int = -1) -> float:
+        now = self.win.flip()
+        self.frame_times.record(now, epoch, trial)
+        if self.startup.first_frame is None:
+            self.startup.first_frame = self.startup.now()
+            logging.exp(self.startup.report())
+        return now
+
+
+    def __save_runinfo(self) -> None:
+        pool, system_info = self.system_info
+        with self.startup.phase('runinfo'):
+            save_runinfo(
+                os.path.join('data-raw', f'sub-{self.sub}_task-{self.task}_runinfo.json.gz'),
+                self.window_info,
+                system_info.result())
+        pool.shutdown()
+
+
     # run the experiment
     def run(self) -> None:
         self.win.setMouseVisible(False)
 
         self.welcome.draw()
-        self.win.flip()
+        self.__flip()
+        if self.task == 'main':
+            self.__save_runinfo()
         self.io.clearEvents()
         self.io.devices.keyboard.waitForPresses(keys=['c'])
 
-        for block in self.trialdf.block.unique():
+        schedule = self.schedule
+        last_block = schedule.blocks[-1]
+        for block_index, block in enumerate(schedule.blocks):
             self.rest.text = f'''
-            you are about to start part {block+1} of {self.trialdf.block.max()+1} in the experiment                         
+            you are about to start part {block+1} of {last_block+1} in the experiment                         
 
             remember:
             cross and flower shapes mean categorize direction
@@ -343,27 +503,27 @@ class Experiment(object):
             when you are ready to begin this part, press "c"
             '''
             self.rest.draw()
-            self.win.flip()
+            self.__flip()
             self.io.clearEvents()
             self.io.devices.keyboard.waitForPresses(keys=['c'])
 
             self.fix.draw()
-            self.win.flip()
+            self.__flip()
             self.waiter.start(self.initial_pause_sec)
-            for __t in self.trialdf.query(f'block == {block}').itertuples():
-                trial = __t._asdict()
+            for i in schedule.block_trials(block_index):
+                trial = schedule.trial_records[i]
                 # fixation
                 self.fix.draw()
                 self.waiter.complete()
-                trial['fix_start'] = self.win.flip()
+                trial['fix_start'] = self.__flip(Epoch.fix, i)
                 self.waiter.start(self.fix_sec)
-                self.__prep_dots(trial['direction'], (trial['R'], trial['G'], trial['B']))
+                self.__prep_dots(i)
             
                 # cue
-                self.__drawcue(trial['shape'])
+                self.__drawcue(schedule.cue[i])
                 self.fix.draw()
                 self.waiter.complete()
-                trial['cue_start'] = self.win.flip()
+                trial['cue_start'] = self.__flip(Epoch.cue, i)
                 self.waiter.start(self.cue_sec)
 
                 # stim
@@ -372,17 +532,18 @@ class Experiment(object):
 
                     if flip == 0: 
                         self.waiter.complete()
-                        self.io.clearEvents()
+                        self.keyboard.arm(keys=['left','right','escape'])
                 
-                    now = self.win.flip()
-                    self.io.sendMessageEvent(f'trial-{trial["trial"]}_flip-{flip}', category="flip", sec_time=now)
+                    now = self.__flip(Epoch.dots, i)
+                    self.flip_log.record(flip, now)
 
                     if flip == 0:
                         trial['dots_start'] = now
             
-                    self.presses = self.io.devices.keyboard.getPresses(keys=['left','right','escape'])
+                    self.presses = self.keyboard.poll()
                     if self.presses:
                         break                    
+                self.keyboard.disarm()
                                         
                 # record trial results (if any) and prepare for next trial            
                 trial['dots_end'] = now
@@ -390,20 +551,16 @@ class Experiment(object):
                     trial['response_time'] = self.presses[0].time
                     trial['response_key'] = self.presses[0].key
 
-                trial['correct'] = (
-                    (trial['response_key'] == 'left' and 
-                      ((trial['shape'] in ['triangle', 'circle'] and trial['hue'] <= 90) 
-                      or (trial['shape'] in ['cross', 'fleur'] and trial['direction'] >= 0)))
-                or (trial['response_key'] == 'right' and 
-                    ((trial['shape'] in ['triangle', 'circle'] and trial['hue'] >= 90) 
-                    or (trial['shape'] in ['cross', 'fleur'] and trial['direction'] <= 0))))
+                trial['correct'] = is_correct(schedule.expected_key[i], trial['response_key'])
                 if trial['correct']:
                     self.correct.draw()
                 else:
                     self.incorrect.draw()
 
-                trial['feedback_start'] = self.win.flip()
+                trial['feedback_start'] = self.__flip(Epoch.feedback, i)
                 self.waiter.start(self.feedback_sec)            
+                # flip times of the whole trial are sent while the feedback is up
+                self.flip_log.flush(self.io, trial['block'], trial['trial'])
             
                 # At the end of each trial, before getting
                 # the next trial handler row, send the trial
@@ -411,7 +568,7 @@ class Experiment(object):
                 # reference.
                 self.io.addTrialHandlerRecord(trial)
             
-            if block == self.trialdf.block.max():
+            if block == last_block:
                 msg = '''
                 you have reached the end of the experiment!
 
@@ -430,10 +587,27 @@ class Experiment(object):
             self.rest.text = msg
             self.rest.draw()
             self.waiter.complete()
-            self.win.flip()
+            self.__flip()
             self.io.clearEvents()
             self.io.devices.keyboard.waitForPresses(keys=['c'])
 
+        self.report_frame_timing()
+
+
+    def report_frame_timing(self) -> None:
+        # frame pacing of every trial, against the refresh period measured during the dots
+        nominal = getattr(self.win, 'monitorFramePeriod', None) or 1 / self.refresh_rate
+        flips = self.frame_times.flips()
+        period = measured_period(flips, nominal)
+        summary = summarize(flips, period, self.expected_epoch_sec)
+        logging.exp(report(summary, period))
+
+        if self.task == 'main':
+            prefix = os.path.join('data-raw', f'sub-{self.sub}_task-{self.task}')
+            self.frame_times.save(f'{prefix}_frames.npz', nominal, self.expected_epoch_sec)
+            summary.to_csv(f'{prefix}_frametiming.csv', index=False)
+            histogram(flips, period).to_csv(f'{prefix}_framehistogram.csv', index=False)
+
 
 
     @staticmethod
@@ -445,7 +619,7 @@ class Experiment(object):
     def instruct(self) -> None:
         self.win.setMouseVisible(False)
 
-        text = visual.TextStim(
+        text = self.backend.TextStim(
             win=self.win,
             text='''
             in this experiment you will see a bunch of colored dots move together
@@ -458,11 +632,11 @@ class Experiment(object):
             wrapWidth = 50)
 
         text.draw()
-        self.win.flip()
+        self.__flip()
         self.io.clearEvents()
         self.io.devices.keyboard.waitForPresses(keys=['c'])
 
-        text = visual.TextStim(
+        text = self.backend.TextStim(
             win=self.win,
             text='''
             when you see these cues, categorize the motion
@@ -480,11 +654,11 @@ class Experiment(object):
         self.line2.pos = (-1,0)
         self.fleur.pos = (1,0)
         self.dots.dir = 30
-        self.dots.color = cst.cielch2rgb([90,15,120], clip=True)
+        self.dots.color = self.lab2rgb(lch2lab([90,15,120]))
         text.draw()
-        self.__drawcue('cross')
-        self.__drawcue('fluer')
-        self.win.flip()        
+        self.__drawcue(Cue.cross)
+        self.__drawcue(Cue.fleur)
+        self.__flip()        
         self.line1.pos = (0,0)
         self.line2.pos = (0,0)
         self.fleur.pos = (0,0)
@@ -500,7 +674,7 @@ class Experiment(object):
         self.io.clearEvents()
         while 1:
             self.draw_list([text, self.dots, self.fix])
-            self.win.flip()    
+            self.__flip()    
             self.presses = self.io.devices.keyboard.getPresses(keys=['left','escape'])
             if self.presses:
                 break
@@ -517,9 +691,9 @@ class Experiment(object):
         self.triangle.pos = (-1,0)
         self.circle.pos = (1,0)
         text.draw()
-        self.__drawcue('triangle')
-        self.__drawcue('circle')
-        self.win.flip()
+        self.__drawcue(Cue.triangle)
+        self.__drawcue(Cue.circle)
+        self.__flip()
         self.io.clearEvents()
         self.triangle.pos = (0,0)
         self.circle.pos = (0,0)
@@ -533,7 +707,7 @@ class Experiment(object):
         self.io.clearEvents()
         while 1:
             self.draw_list([text, self.dots, self.fix])
-            self.win.flip()    
+            self.__flip()    
             self.presses = self.io.devices.keyboard.getPresses(keys=['right','escape'])
             if self.presses:
                 break
@@ -552,19 +726,20 @@ class Experiment(object):
         '''
 
         text.draw()
-        self.win.flip()
+        self.__flip()
         self.io.clearEvents()
         self.io.devices.keyboard.waitForPresses(keys=['c'])
 
         # fixation
         self.fix.draw()
-        self.win.flip()
+        self.__flip(Epoch.fix)
         self.waiter.start(self.fix_sec)
+        self.dots.precomputeTrajectory(self.n_flips_per_dots)
 
         # cue
         self.draw_list([self.triangle, self.fix])
         self.waiter.complete()
-        self.win.flip()
+        self.__flip(Epoch.cue)
         self.waiter.start(self.cue_sec)
 
         # stim
@@ -573,12 +748,13 @@ class Experiment(object):
 
             if flip == 0: 
                 self.waiter.complete()
-                self.io.clearEvents()
+                self.keyboard.arm(keys=['right', 'escape'])
                 
-            self.win.flip()
-            self.presses = self.io.devices.keyboard.getPresses(keys=['right', 'escape'])
+            self.__flip(Epoch.dots)
+            self.presses = self.keyboard.poll()
             if self.presses:
                 break
+        self.keyboard.disarm()
 
     
         text.text = '''
@@ -591,7 +767,7 @@ class Experiment(object):
 
         self.io.clearEvents()
         self.draw_list([text, self.fix])
-        self.win.flip()
+        self.__flip()
         self.io.clearEvents()
         self.io.devices.keyboard.waitForPresses(keys=['c'])
             
@@ -606,8 +782,9 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(epilog=example_usage, formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument("-t", "--task", help="task flag. one of 'test', 'instruct', 'main'", choices=['test', 'instruct', 'main'], default='main')
     parser.add_argument("--no-demographics", help="don't ask for demographic information", action='store_true', default=False)
+    parser.add_argument("--calibrated", help="convert colors with the monitor's measured calibration", action='store_true', default=False)
     args = parser.parse_args()
 
-    experiment = Experiment(no_demographics=args.no_demographics, task=args.task)
+    experiment = Experiment(no_demographics=args.no_demographics, task=args.task, calibrated=args.calibrated)
     experiment.run()
     core.quit()
@@ -0,0 +1,108 @@
+"""Palettes of CIELAB colors, converted in one go and drawn as a single image.
+
+A palette is a grid of tiles: one per (lightness, chroma) pair with hue varying down
+the tile (lch_grid), or one per lightness spanning the a*, b* plane (lab_grid). The
+colors of the whole grid are converted to rgb by one vectorized call, or, for large
+grids, in chunks on a pool of processes. The tiles are then laid out in one atlas
+image, which is drawn with a single ImageStim (draw) or written to a file (save).
+
+Atlases are in reading order: the first row of the array is the top of the image.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+# colors converted per task when converting on a pool of processes
+chunk_colors = 2**18
+background = -1.0
+
+_lab2rgb: Optional[Callable] = None
+
+
+def lch_grid(lightness: Sequence[float], chroma: Sequence[float], n_hues: int) -> np.ndarray:
+    """Lab of every lightness x chroma x hue (0 to 360 degrees, inclusive)."""
+    lightness = np.asarray(lightness, dtype=float)
+    chroma = np.asarray(chroma, dtype=float)
+    hue = np.radians(np.linspace(0, 360, n_hues, endpoint=True))
+    lab = np.empty((len(lightness), len(chroma), n_hues, 3))
+    lab[..., 0] = lightness[:, None, None]
+    lab[..., 1] = chroma[None, :, None] * np.cos(hue)
+    lab[..., 2] = chroma[None, :, None] * np.sin(hue)
+    return lab
+
+
+def lab_grid(lightness: Sequence[float], n: int, extent: float = 128) -> np.ndarray:
+    """Lab of every lightness x a* x b*, a* and b* on n steps from -extent up to extent."""
+    lightness = np.asarray(lightness, dtype=float)
+    ab = np.arange(n) * (2 * extent / n) - extent
+    lab = np.empty((len(lightness), n, n, 3))
+    lab[..., 0] = lightness[:, None, None]
+    lab[..., 1] = ab[None, :, None]
+    lab[..., 2] = ab[None, None, :]
+    return lab
+
+
+def _set_lab2rgb(lab2rgb: Callable) -> None:
+    # the conversion (and its calibration) is sent to each process once, not per chunk
+    global _lab2rgb
+    _lab2rgb = lab2rgb
+
+
+def _convert_chunk(lab: np.ndarray) -> np.ndarray:
+    return _lab2rgb(lab)
+
+
+def convert(lab: np.ndarray, lab2rgb: Callable, jobs: int = 1) -> np.ndarray:
+    """rgb of an array of Lab colors (... x 3), converted in one call, or in chunks by jobs processes."""
+    flat = lab.reshape(-1, 3)
+    if jobs == 1 or len(flat) <= chunk_colors:
+        return lab2rgb(flat).reshape(lab.shape)
+    chunks = [flat[i:i + chunk_colors] for i in range(0, len(flat), chunk_colors)]
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_set_lab2rgb, initargs=(lab2rgb,)) as pool:
+        return np.concatenate(list(pool.map(_convert_chunk, chunks))).reshape(lab.shape)
+
+
+def atlas(tiles: np.ndarray, gap: int = 0) -> np.ndarray:
+    """One image of a rows x columns x height x width x 3 grid of tiles, gap pixels apart."""
+    rows, columns, height, width, _ = tiles.shape
+    image = np.full(
+        (rows * height + (rows - 1) * gap, columns * width + (columns - 1) * gap, 3),
+        background, dtype=np.float32)
+    for row in range(rows):
+        top = row * (height + gap)
+        for column in range(columns):
+            left = column * (width + gap)
+            image[top:top + height, left:left + width] = tiles[row, column]
+    return image
+
+
+def to_uint8(image: np.ndarray) -> np.ndarray:
+    """psychopy rgb (-1 to 1) as 8 bit values."""
+    return np.rint((np.clip(image, -1, 1) + 1) * 127.5).astype(np.uint8)
+
+
+def save(path: str, image: np.ndarray) -> None:
+    """Write an atlas to an image file (e.g. .png, needs Pillow), or as rgb to .npy."""
+    if os.path.splitext(path)[1] == '.npy':
+        np.save(path, image)
+        return
+    from PIL import Image
+
+    Image.fromarray(to_uint8(image)).save(path)
+
+
+def draw(win, image: np.ndarray):
+    """Draw an atlas with one stimulus, scaled down if it does not fit the window."""
+    from psychopy import visual
+
+    height, width = image.shape[:2]
+    scale = min(1.0, win.size[0] / width, win.size[1] / height)
+    stim = visual.ImageStim(
+        win=win, image=image, units='pix', size=(width * scale, height * scale),
+        # textures are drawn with their first row at the bottom
+        flipVert=True)
+    stim.draw()
+    return stim
@@ -0,0 +1,193 @@
+"""Replay recorded trials offline: every flip of a trial's dots, as images.
+
+A trial's dots are fully determined by its record: the field is drawn from the
+trial's dots_seed, the signal dots move in its direction, and the dots have its
+color (R, G, B). The same update rule as WrappedDot (kinematics.py) regenerates the
+dots' positions on each flip, which are then drawn the way OpenGL draws them (square
+points dotSize pixels wide), with the fixation point on top, onto the black
+background. Only a square around the field is drawn, not the whole window.
+
+The number of flips of a trial is taken from the session's fliplog messages, or,
+for trial tables without them (e.g. csv files), worked out from the times the dots
+started and ended. Trials are rendered in parallel, each to
+
+    {out}/block-{block}_trial-{trial}.npz  frames (flips x height x width x rgb, uint8)
+                                           and flip times, compressed
+    {out}/block-{block}_trial-{trial}.gif  animation (--format gif, needs Pillow)
+
+Nothing needs a display or a graphics card. Pixels per degree depend on the monitor
+(and are not recorded), so they have to be given.
+
+example:
+    python replay.py data-raw/sub-3.hdf5 --pix-per-deg 40 -o replay --block 2 --trial 17
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from kinematics import DotKinematics, RandomPool, newDotsXY
+from main import Experiment
+
+_2pi = 2 * np.pi
+_piOver180 = np.pi / 180.
+background = (0, 0, 0)
+fix_color = (255, 255, 255)
+
+
+def trajectory(seed: int, direction: float, n_frames: int, params=Experiment) -> np.ndarray:
+    """Positions (deg) of the dots on each flip, as WrappedDot precomputes them."""
+    n = params.ndots
+    size = np.array([params.dotfield_diameter_deg, params.dotfield_diameter_deg], dtype=float)
+    pool = RandomPool(seed)
+    kinematics = DotKinematics(n)
+    kinematics.rand = pool.random
+    # rounded as WrappedDot.coherence does
+    kinematics.nSignal = int(round(params.dot_coherence * n) / n * n)
+
+    # the same draws, in the same order, as setting WrappedDot.seed
+    kinematics.xy[:] = newDotsXY(n, 'circle', size, pool.random)
+    pool.random(n)  # lives, which do not matter for the dots of the experiment
+    kinematics.dirs[:] = pool.random(n) * _2pi
+    kinematics.dirs[:kinematics.nSignal] = direction * _piOver180
+    kinematics.updateVelocities()
+
+    xy = np.empty((n_frames, n, 2))
+    speed = params.dot_speed_deg_per_sec / params.refresh_rate
+    for frame in range(n_frames):
+        kinematics.step(speed, size[0] / 2, 'direction')
+        xy[frame] = kinematics.xy
+    return xy
+
+
+def to_uint8(rgb) -> np.ndarray:
+    """psychopy rgb (-1 to 1) as 8 bit values."""
+    return np.rint((np.asarray(rgb, dtype=float) + 1) / 2 * 255).clip(0, 255).astype(np.uint8)
+
+
+def rasterize(
+    xy: np.ndarray,
+    pix_per_deg: float,
+    rgb,
+    params=Experiment) -> np.ndarray:
+    """Frames (flips x height x width x 3, uint8) of the dots at xy (deg)."""
+    dot_px = max(int(round(params.dotsize_deg * pix_per_deg)), 1)
+    width = int(np.ceil(params.dotfield_diameter_deg * pix_per_deg)) + 2 * dot_px
+    width += width % 2
+    n_frames = len(xy)
+
+    # pixels covered by a point: those whose centres are within half its size
+    first = np.ceil(xy * pix_per_deg + width / 2 - dot_px / 2 - 0.5).astype(np.int64)
+    offsets = np.arange(dot_px)
+    cols = first[:, :, 0, None, None] + offsets[None, None, None, :]
+    # rows are counted from the top of the image, y upwards
+    rows = width - 1 - (first[:, :, 1, None, None] + offsets[None, None, :, None])
+    frames = np.broadcast_to(np.arange(n_frames)[:, None, None, None], rows.shape[:2] + (dot_px, dot_px))
+    cols, rows = np.broadcast_arrays(cols, rows)
+    inside = (cols >= 0) & (cols < width) & (rows >= 0) & (rows < width)
+
+    mask = np.zeros((n_frames, width, width), dtype=bool)
+    mask[frames[inside], rows[inside], cols[inside]] = True
+
+    image = np.empty((n_frames, width, width, 3), dtype=np.uint8)
+    image[:] = background
+    image[mask] = to_uint8(rgb)
+    # the fixation point is drawn over the dots
+    centres = np.arange(width) + 0.5 - width / 2
+    fix = (centres[:, None] ** 2 + centres[None, :] ** 2) <= (params.fix_radius * pix_per_deg) ** 2
+    image[:, fix] = fix_color
+    return image
+
+
+def n_flips(trials: pd.DataFrame, flips: Optional[pd.DataFrame] = None, params=Experiment) -> np.ndarray:
+    """Number of flips the dots of each trial were shown for."""
+    if flips is not None and not flips.empty:
+        counts = flips.groupby(['block', 'trial']).size()
+        index = pd.MultiIndex.from_arrays([trials['block'], trials['trial']])
+        return counts.reindex(index, fill_value=0).to_numpy()
+    shown = (trials['dots_end'] - trials['dots_start']).to_numpy(dtype=float)
+    n = np.rint(shown * params.refresh_rate) + 1
+    return np.where(np.isnan(n), 0, np.minimum(n, params.n_flips_per_dots)).astype(int)
+
+
+def render_trial(trial: Dict, out: str, pix_per_deg: float, format: str = 'npz') -> str:
+    xy = trajectory(trial['dots_seed'], trial['direction'], trial['n_flips'])
+    frames = rasterize(xy, pix_per_deg, (trial['R'], trial['G'], trial['B']))
+    path = os.path.join(out, f"block-{trial['block']}_trial-{trial['trial']}.{format}")
+    if format == 'gif':
+        from PIL import Image
+
+        images = [Image.fromarray(frame) for frame in frames]
+        # gif delays are in hundredths of a second, so this is only close
+        images[0].save(
+            path, save_all=True, append_images=images[1:],
+            duration=int(round(1000 / Experiment.refresh_rate)), loop=0)
+    else:
+        np.savez_compressed(
+            path,
+            frames=frames,
+            times=np.asarray(trial.get('times', []), dtype=float),
+            seed=trial['dots_seed'],
+            direction=trial['direction'],
+            pix_per_deg=pix_per_deg)
+    return path
+
+
+def read_session(path: str):
+    """Trial records and flips (None for csv files) of a session."""
+    if os.path.splitext(path)[1] == '.csv':
+        return pd.read_csv(path), None
+    from fliplog import read_flips
+    from scoring import read_trials
+
+    return read_trials(path), read_flips(path)
+
+
+def replay(
+    trials: pd.DataFrame,
+    out: str,
+    pix_per_deg: float,
+    flips: Optional[pd.DataFrame] = None,
+    format: str = 'npz',
+    jobs: Optional[int] = None) -> List[str]:
+    """Render every trial of trials whose dots were shown; returns the files written."""
+    if 'dots_seed' not in trials:
+        raise ValueError('trials have no dots_seed, so their dots can not be reproduced')
+    trials = trials.assign(n_flips=n_flips(trials, flips))
+    trials = trials[trials['n_flips'] > 0]
+    records = trials[['block', 'trial', 'dots_seed', 'direction', 'R', 'G', 'B', 'n_flips']].to_dict('records')
+    if flips is not None:
+        times = {key: d['time'].to_numpy() for key, d in flips.groupby(['block', 'trial'])}
+        for record in records:
+            record['times'] = times.get((record['block'], record['trial']), [])
+
+    os.makedirs(out, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(
+            render_trial, records,
+            [out] * len(records), [pix_per_deg] * len(records), [format] * len(records),
+            chunksize=8))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("session", help="iohub hdf5 file, or csv file of trial records")
+    parser.add_argument("-o", "--out", help="directory to write the frames to", required=True)
+    parser.add_argument("--pix-per-deg", help="pixels per degree of the session's monitor", type=float, required=True)
+    parser.add_argument("--format", help="npz (frames as arrays) or gif", choices=['npz', 'gif'], default='npz')
+    parser.add_argument("--block", help="only replay this block", type=int, default=None)
+    parser.add_argument("--trial", help="only replay this trial", type=int, default=None)
+    parser.add_argument("-j", "--jobs", help="number of processes (default: one per cpu)", type=int, default=None)
+    args = parser.parse_args()
+
+    trials, flips = read_session(args.session)
+    if args.block is not None:
+        trials = trials[trials['block'] == args.block]
+    if args.trial is not None:
+        trials = trials[trials['trial'] == args.trial]
+    written = replay(trials, args.out, args.pix_per_deg, flips=flips, format=args.format, jobs=args.jobs)
+    print(f'{len(written)} trials written to {args.out}')
@@ -0,0 +1,80 @@
+"""Keyboard presses collected by a background thread while the dots are shown.
+
+Asking iohub for presses is a synchronous round trip to the iohub process. Instead of
+making it in the frame loop, a thread drains iohub's keyboard events into a queue
+while the listener is armed, so the frame loop only checks the queue, which never
+waits.
+
+Each press keeps the time iohub stamped it with when the keyboard event arrived, on
+the same clock as the flips. So how often the thread drains (poll_sec) only bounds
+how late the frame loop learns of a press, not the recorded response time, and it can
+be a few milliseconds rather than as often as possible: each drain is a request to
+the iohub process, and the thread competes with the frame loop for the GIL.
+
+The iohub connection is not thread-safe. The thread only uses it while armed, holding
+`lock`; arm() clears iohub's events before the thread starts, and disarm() waits for
+any request in flight to finish. The experiment must not use the connection itself
+between arm() and disarm().
+"""
+
+import queue
+import threading
+from typing import List, Optional, Sequence
+
+
+class KeyboardListener(object):
+
+    def __init__(self, io, poll_sec: float = 0.004):
+        self.io = io
+        self.poll_sec = poll_sec
+        self.keys: Optional[Sequence[str]] = None
+        self.presses = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.__armed = threading.Event()
+        self.__stopped = threading.Event()
+        self.thread = threading.Thread(target=self.__drain, name='keyboard', daemon=True)
+        self.thread.start()
+
+
+    def __drain(self) -> None:
+        while not self.__stopped.is_set():
+            if not self.__armed.wait(timeout=0.05):
+                continue
+            with self.lock:
+                # may have been disarmed while waiting for the lock
+                if self.__armed.is_set():
+                    for press in self.io.devices.keyboard.getPresses(keys=self.keys):
+                        self.presses.put(press)
+            self.__stopped.wait(self.poll_sec)
+
+
+    def arm(self, keys: Sequence[str]) -> None:
+        """Start collecting presses of keys. iohub's events, and any presses collected
+        before, are discarded first."""
+        with self.lock:
+            self.io.clearEvents()
+        while not self.presses.empty():
+            self.presses.get_nowait()
+        self.keys = list(keys)
+        self.__armed.set()
+
+
+    def poll(self) -> List:
+        """Presses collected since the last poll, without waiting."""
+        presses = []
+        while not self.presses.empty():
+            presses.append(self.presses.get_nowait())
+        return presses
+
+
+    def disarm(self) -> None:
+        """Stop collecting, and wait until the thread no longer uses the connection."""
+        self.__armed.clear()
+        with self.lock:
+            pass
+
+
+    def stop(self) -> None:
+        self.disarm()
+        self.__stopped.set()
+        self.thread.join()
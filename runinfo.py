@@ -0,0 +1,108 @@
+"""What the session ran on: the window (refresh rate, OpenGL) and the system
+(platform, python packages, other processes).
+
+psychopy's RunTimeInfo gathers both at once, and enumerating processes is slow, so
+the system is profiled in a separate process (start_system_info) while the session
+goes on. Only what needs the window, the refresh test and OpenGL details, is measured
+on the main thread (window_info). Both are saved together as gzipped json, which
+unlike a pickle of RunTimeInfo can be read without psychopy.
+
+example:
+    python runinfo.py data-raw/*_runinfo.json.gz -o runinfo.csv
+"""
+
+import argparse
+import gzip
+import json
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Iterable, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+
+def _jsonable(x):
+    if isinstance(x, np.ndarray):
+        return x.tolist()
+    if isinstance(x, np.generic):
+        return x.item()
+    return repr(x)
+
+
+def system_info(verbose: bool = True, userProcsDetailed: bool = True) -> Dict:
+    """RunTimeInfo without a window."""
+    from psychopy.info import RunTimeInfo
+
+    info = RunTimeInfo(win=False, refreshTest=None, verbose=verbose, userProcsDetailed=userProcsDetailed)
+    # round trip, so that what is returned is what will be saved
+    return json.loads(json.dumps(dict(info), default=_jsonable))
+
+
+def start_system_info(**kwargs) -> Tuple[ProcessPoolExecutor, Future]:
+    """Start system_info in another process.
+
+    The process is spawned rather than forked, so that it does not inherit the
+    window's OpenGL context or the iohub connection.
+    """
+    pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+    return pool, pool.submit(system_info, **kwargs)
+
+
+def window_info(win, nFrames: int = 120) -> Dict:
+    """Refresh test and details of the window, as RunTimeInfo reports them."""
+    from psychopy import visual
+    from pyglet.gl import gl_info
+
+    average, sd, median = visual.getMsPerFrame(win, nFrames=nFrames, showVisual=True)
+    info = {
+        'windowRefreshTimeAvg_ms': average,
+        'windowRefreshTimeMedian_ms': median,
+        'windowRefreshTimeSD_ms': sd,
+        'windowWinType': win.winType,
+        'windowIsFullScr': win._isFullScr,
+        'windowUnits': win.units,
+        'windowScreen': win.screen,
+        'windowSize_pix': win.size,
+        'windowWaitBlanking': win.waitBlanking,
+        'windowRefreshThreshold_sec': win.refreshThreshold,
+        'windowMonitor.name': win.monitor.name,
+        'windowMonitor.getDistance_cm': win.monitor.getDistance(),
+        'windowMonitor.getWidth_cm': win.monitor.getWidth(),
+        'openGLVendor': gl_info.get_vendor(),
+        'openGLRenderingEngine': gl_info.get_renderer(),
+        'openGLVersion': gl_info.get_version()}
+    return json.loads(json.dumps(info, default=_jsonable))
+
+
+def save(path: Union[str, os.PathLike], window: Dict, system: Dict) -> None:
+    # 'x', like the pickles it replaces, so that a session is never overwritten
+    with gzip.open(path, 'xt', encoding='utf-8') as f:
+        json.dump({'window': window, 'system': system}, f)
+
+
+def load(path: Union[str, os.PathLike]) -> Dict:
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def summarize(paths: Iterable[Union[str, os.PathLike]]) -> pd.DataFrame:
+    """One row per session, with every scalar of its window and system info."""
+    rows = []
+    for path in paths:
+        info = load(path)
+        row = {'file': os.path.basename(path)}
+        for section in ('window', 'system'):
+            row.update({k: v for k, v in info[section].items() if not isinstance(v, (list, dict))})
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", help="runinfo files (.json.gz)", nargs='+')
+    parser.add_argument("-o", "--out", help="csv file to write the summary to", required=True)
+    args = parser.parse_args()
+
+    summarize(args.files).to_csv(args.out, index=False)
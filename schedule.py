@@ -0,0 +1,60 @@
+"""Compile a subject's trial table into flat arrays before the experiment starts,
+so that the trial loop only has to index them.
+"""
+
+from enum import IntEnum
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from psychopy.colors import Color
+
+from scoring import expected_keys
+
+
+class Cue(IntEnum):
+    triangle = 0
+    circle = 1
+    cross = 2
+    fleur = 3
+
+    @property
+    def task(self) -> str:
+        return 'color' if self in (Cue.triangle, Cue.circle) else 'direction'
+
+
+class Schedule(object):
+    """Trials of a session, one entry per row of the trial table, in presentation order.
+
+    trial_records holds a dict per trial with every column of the table, ready to be
+    filled in and handed to io.addTrialHandlerRecord. Everything needed to set up (and
+    score) a trial is stored in arrays indexed by trial number.
+    """
+
+    def __init__(self, trialdf: pd.DataFrame):
+        self.n_trials = len(trialdf)
+        self.trial = trialdf['trial'].to_numpy()
+        self.block = trialdf['block'].to_numpy()
+        self.direction = trialdf['direction'].to_numpy(dtype=float)
+        self.hue = trialdf['hue'].to_numpy(dtype=float)
+        self.dots_seed = trialdf['dots_seed'].to_numpy()
+        self.cue = np.array([Cue[shape] for shape in trialdf['shape']], dtype=np.int8)
+        self.expected_key = expected_keys(trialdf['shape'], self.hue, self.direction)
+        self.rgb: List[Tuple[float, float, float]] = [
+            tuple(x) for x in trialdf[['R', 'G', 'B']].to_numpy(dtype=float)]
+        # one Color per distinct rgb, shared by all trials with that color, so that
+        # setting a stimulus' color does not need to parse anything
+        colors = {rgb: Color(rgb, 'rgb') for rgb in set(self.rgb)}
+        self.color: List[Color] = [colors[rgb] for rgb in self.rgb]
+        self.trial_records: List[Dict] = trialdf.to_dict('records')
+
+        # trials of each block are contiguous, so a block is a range of trial indices
+        if np.any(np.diff(self.block) < 0):
+            raise ValueError('trials must be sorted by block')
+        self.blocks, self.block_starts = np.unique(self.block, return_index=True)
+        self.block_stops = np.append(self.block_starts[1:], self.n_trials)
+
+
+    def block_trials(self, block_index: int) -> range:
+        return range(self.block_starts[block_index], self.block_stops[block_index])
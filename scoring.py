@@ -0,0 +1,89 @@
+"""Which key is correct on each trial, and whether a response was correct.
+
+The answer for every trial of a design is computed up front, so that the experiment
+only has to compare the pressed key against a table. The same rules are used to
+re-score whole iohub sessions after the fact.
+
+- color cues (triangle, circle): "left" for redder (hue below 90), "right" for greener
+- direction cues (cross, fleur): "left" for upwards (direction above 0), "right" for downwards
+- hue 90 on color trials and direction 0 on direction trials have no right answer, so
+  either key counts as correct
+
+example:
+    python scoring.py data-raw/*.hdf5 -o scored.csv
+"""
+
+import argparse
+import os
+from typing import Iterable, Union
+
+import numpy as np
+import pandas as pd
+
+# codes for the expected key
+LEFT = 0
+RIGHT = 1
+EITHER = 2
+
+color_cues = ['triangle', 'circle']
+boundary_hue = 90
+boundary_direction = 0
+
+
+def expected_keys(shape: Iterable[str], hue: Iterable[float], direction: Iterable[float]) -> np.ndarray:
+    """LEFT, RIGHT or EITHER for each trial."""
+    is_color = np.isin(np.asarray(shape), color_cues)
+    # negative values mean "left", positive "right"
+    signed = np.where(
+        is_color,
+        np.asarray(hue, dtype=float) - boundary_hue,
+        boundary_direction - np.asarray(direction, dtype=float))
+    return np.select([signed < 0, signed > 0], [LEFT, RIGHT], EITHER).astype(np.int8)
+
+
+def is_correct(expected_key: int, response_key: str) -> bool:
+    return ((response_key == 'left' and expected_key != RIGHT)
+        or (response_key == 'right' and expected_key != LEFT))
+
+
+def score(expected_key: np.ndarray, response_key: Iterable[str]) -> np.ndarray:
+    """Vectorized is_correct."""
+    response_key = np.asarray(response_key)
+    return (((response_key == 'left') & (expected_key != RIGHT))
+        | ((response_key == 'right') & (expected_key != LEFT)))
+
+
+def read_trials(datastore: Union[str, os.PathLike]) -> pd.DataFrame:
+    """Trial records (condition variables) of an iohub hdf5 datastore."""
+    # slow to import, and only needed after the session
+    import tables
+
+    with tables.open_file(datastore, mode='r') as f:
+        cv = next(iter(f.root.data_collection.condition_variables))
+        d = pd.DataFrame(cv.read())
+    for column in d.columns[d.dtypes == object]:
+        d[column] = d[column].str.decode('utf-8')
+    return d
+
+
+def rescore(d: pd.DataFrame) -> pd.DataFrame:
+    """Add the expected key and (re)compute correct for a table of trials."""
+    expected = expected_keys(d['shape'], d['hue'], d['direction'])
+    return d.assign(
+        expected_key = expected,
+        correct = score(expected, d['response_key']))
+
+
+def rescore_sessions(datastores: Iterable[Union[str, os.PathLike]]) -> pd.DataFrame:
+    return pd.concat(
+        [rescore(read_trials(f)).assign(datastore=os.path.basename(f)) for f in datastores],
+        ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("datastores", help="iohub hdf5 files", nargs='+')
+    parser.add_argument("-o", "--out", help="csv file to write the scored trials to", required=True)
+    args = parser.parse_args()
+
+    rescore_sessions(args.datastores).to_csv(args.out, index=False)
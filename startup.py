@@ -0,0 +1,50 @@
+"""How long each phase of starting a session took, and when the first frame was shown.
+
+Phases may run on different threads, so each is recorded with its thread, start and
+end (in seconds since the timer was made), and the report shows how they overlapped.
+"""
+
+import threading
+import timeit
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Tuple
+
+
+class PhaseTimer(object):
+
+    def __init__(self):
+        self.origin = timeit.default_timer()
+        self.phases: List[Tuple[str, str, float, float]] = []
+        self.first_frame = None
+        self.__lock = threading.Lock()
+
+
+    def now(self) -> float:
+        return timeit.default_timer() - self.origin
+
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = self.now()
+        try:
+            yield
+        finally:
+            with self.__lock:
+                self.phases.append((name, threading.current_thread().name, start, self.now()))
+
+
+    def timed(self, name: str, f: Callable) -> Callable:
+        """f, timed as a phase when it is called (e.g. on a thread pool)."""
+        def timed_f(*args, **kwargs):
+            with self.phase(name):
+                return f(*args, **kwargs)
+        return timed_f
+
+
+    def report(self) -> str:
+        lines = [f"{'phase':<16} {'thread':<24} {'start s':>8} {'end s':>8} {'took s':>8}"]
+        for name, thread, start, end in sorted(self.phases, key=lambda x: x[2]):
+            lines.append(f'{name:<16} {thread:<24} {start:8.3f} {end:8.3f} {end - start:8.3f}')
+        if self.first_frame is not None:
+            lines.append(f'first frame at {self.first_frame:.3f} s')
+        return '\n'.join(lines)
@@ -1,21 +1,42 @@
+import argparse
+import os
+import sys
+
 import numpy as np
-import pandas as pd
-
-from psychopy import core, visual, data, clock, monitors
-# from psychopy.iohub.client.connect import launchHubServer
-from psychopy.tools import colorspacetools as cst
-
-def make_palette(luminance, chroma):
-  size0 = 50
-  size1 = 50
-  lab = luminance*np.ones([size0,size1,3], dtype=float)
-  hues = np.radians(np.linspace(0, 360, size1, endpoint=True))
-  lab[:,:,1] = chroma*np.cos(hues)
-  lab[:,:,2] = chroma*np.sin(hues)
-  
-  rgb = cst.cielab2rgb(lab, clip=True)
-  palette = visual.ImageStim(win=win, image=rgb, units='pix', size=(size0, size1), ori=90)
-  return palette
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from calibration import asus_calibration
+from colorcache import default_lab2rgb
+from palette import atlas, convert, draw, lch_grid, save
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--calibrated", help="convert colors with the monitor's measured calibration", action='store_true', default=False)
+parser.add_argument("--size", help="width and height of each palette, in pixels", type=int, default=50)
+parser.add_argument("--gap", help="space between palettes, in pixels", type=int, default=64)
+parser.add_argument("--n", help="number of lightnesses and of chromas", type=int, default=8)
+parser.add_argument("--jobs", help="number of processes to convert the colors with", type=int, default=1)
+parser.add_argument("--out", help="write the palettes to this image file instead of showing them", default=None)
+args = parser.parse_args()
+
+if args.calibrated:
+  lab2rgb = asus_calibration().lab2rgb
+else:
+  lab2rgb = default_lab2rgb
+
+lumas = np.linspace(80, 100, args.n, dtype=float)
+chromas = np.linspace(0, 20, args.n, dtype=float)
+
+# a palette varies only in hue (down the palette), so one column of each is converted
+rgb = convert(lch_grid(lumas, chromas, args.size), lab2rgb, jobs=args.jobs)
+tiles = np.broadcast_to(rgb[:, :, :, None, :], rgb.shape[:3] + (args.size, 3))
+# lightness increases upwards, chroma to the right
+image = atlas(tiles[::-1], gap=args.gap)
+
+if args.out:
+  save(args.out, image)
+  sys.exit()
+
+from psychopy import visual, monitors
 
 win = visual.Window(
             size=(1920, 1080),
@@ -29,17 +50,5 @@ win = visual.Window(
             # gamma = [r.gamma, g.gamma, b.gamma],
             color='black')
 
-# text = visual.TextStim(win=win)
-
-# io = launchHubServer()
-lumas = np.linspace(80, 100, 8, dtype=float)
-chromas = np.linspace(0, 20, 8, dtype=float)
-
-palletes = [[make_palette(luminance=l, chroma=c) for l in lumas] for c in chromas]
-
-for c, x in zip(palletes, np.linspace(-400, 400, len(palletes))):
-  for pallete, y in zip(c, np.linspace(-400, 400, len(c))):
-    pallete.pos = (x,y)
-    pallete.draw()
-
+draw(win, image)
 win.flip()
@@ -1,19 +1,39 @@
+import argparse
+import os
+import sys
+
 import numpy as np
-import pandas as pd
 
-from psychopy import core, visual, data, clock, monitors
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from calibration import asus_calibration
+from colorcache import default_lab2rgb
+from palette import atlas, convert, draw, lab_grid, save
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--calibrated", help="convert colors with the monitor's measured calibration", action='store_true', default=False)
+parser.add_argument("--size", help="width and height of each palette, in pixels (a* and b* steps)", type=int, default=2**8)
+parser.add_argument("--gap", help="space between palettes, in pixels", type=int, default=0)
+parser.add_argument("--jobs", help="number of processes to convert the colors with", type=int, default=1)
+parser.add_argument("--out", help="write the palettes to this image file instead of showing them", default=None)
+args = parser.parse_args()
+
+if args.calibrated:
+  lab2rgb = asus_calibration().lab2rgb
+else:
+  lab2rgb = default_lab2rgb
+
+lumas = np.linspace(80, 100, 8, dtype=float)
+
+# every palette's a* (down) x b* (across) plane, converted at once; lightness increases to the right
+rgb = convert(lab_grid(lumas, args.size), lab2rgb, jobs=args.jobs)
+image = atlas(rgb[None], gap=args.gap)
+
+if args.out:
+  save(args.out, image)
+  sys.exit()
+
+from psychopy import core, visual, monitors
 from psychopy.iohub.client.connect import launchHubServer
-from psychopy.tools import colorspacetools as cst
-
-def make_palette(luminance):
-  ss = 2**8
-  s = 2**7
-  lab = luminance*np.ones([ss,ss,3], dtype=float)
-  lab[:,:,1:] = np.transpose(np.mgrid[-s:s,-s:s], axes=(2,1,0))
-  
-  rgb = cst.cielab2rgb(lab, clip=True)
-  palette = visual.ImageStim(win=win, image=rgb, units='pix', size=(ss, ss), ori=90)
-  return palette
 
 win = visual.Window(
             size=(1920, 1080),
@@ -27,17 +47,9 @@ win = visual.Window(
             # gamma = [r.gamma, g.gamma, b.gamma],
             color='black')
 
-# text = visual.TextStim(win=win)
-
 io = launchHubServer()
-lumas = np.linspace(80, 100, 8, dtype=float)
-
-palletes = [make_palette(luminance=l) for l in lumas]
-
-for pallete, x in zip(palletes, np.linspace(-800, 800, len(palletes))):
-  pallete.pos = (x,0)
-  pallete.draw()
 
+draw(win, image)
 win.flip()
 io.clearEvents()
 io.devices.keyboard.waitForPresses()
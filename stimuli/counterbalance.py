@@ -1,18 +1,32 @@
-# %%
-import os
-import git
+"""Generate the trial design of each subject.
 
-from itertools import product, repeat, chain
-from random import sample, seed
+Every subject sees each combination of direction, hue and shape once per repetition.
+Trials are shuffled within a subject, and each repetition is split into 4 blocks in
+that shuffled order. Each subject's design only depends on the seed and their id, so
+any one subject can be generated on demand, and designs for many subjects can be
+streamed without holding them all in memory.
 
-import pandas as pd
-import numpy as np
+With --gamut, every color of the design is checked against the monitor's gamut (see
+gamut.py), and generation stops at colors that the monitor can not show, or, with
+--clip, their chroma is reduced to the largest it can show.
+
+example:
+    python stimuli/counterbalance.py --subs 40 --out stimuli/design.csv
+    python stimuli/counterbalance.py --subs 10000 --audit
+    python stimuli/counterbalance.py --subs 40 --gamut calibrated --clip --out stimuli/design.csv
+"""
 
-seed(1234)
+import argparse
+import os
+import sys
+from typing import Dict, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
 
+seed = 1234
 
 options = {
-    'sub': range(0, 40),
     'repetition': range(0, 3),
     'direction': range(0,7),
     'hue': range(0,7),
@@ -20,37 +34,178 @@ options = {
     'lightness': [90],
     'shape': ['fleur', 'circle', 'cross', 'triangle']}
 
-# %%
-d = (
-    pd.DataFrame({r: dict(zip(options.keys(),v)) for r, v in enumerate(product(*options.values()))})
-    .T
-    .assign(group = lambda x: np.where(x['sub'].mod(2), 'even', 'hard'))
-    )
+n_blocks_per_repetition = 4
+
+# level indices -> values, depending on the subject's group
+levels = {
+    'direction': {
+        'even': np.array([-90, -60, -30, 0, 30, 60, 90]),
+        'hard': np.array([-90, -30, -5, 0, 5, 30, 90])},
+    'hue': {
+        'even': np.array([0, 30, 60, 90, 120, 150, 180]),
+        'hard': np.array([0, 60, 85, 90, 95, 120, 180])}}
+
+columns = ['sub', 'repetition', 'direction', 'hue', 'chroma', 'lightness', 'shape', 'group', 'observation', 'block', 'trial']
+
+# every combination of the options, as indices into each option (in itertools.product order)
+_product = np.indices([len(x) for x in options.values()]).reshape(len(options), -1)
+_n = _product.shape[1]
+_n_per_repetition = _n // len(options['repetition'])
+_block_size = _n_per_repetition // n_blocks_per_repetition
+
+
+def group(sub: int) -> str:
+    return 'even' if sub % 2 else 'hard'
+
+
+def subject_arrays(sub: int, seed: int = seed) -> Dict[str, np.ndarray]:
+    """Design of one subject, as arrays sorted by repetition, block and trial."""
+    rng = np.random.default_rng([seed, sub])
+    factor = dict(zip(options.keys(), _product))
+    observation = rng.permutation(_n)
+
+    # in order of observation, each repetition is cut into equal blocks
+    by_observation = np.argsort(observation)
+    repetition = factor['repetition'][by_observation]
+    rank = np.empty(_n, dtype=int)
+    rank[np.argsort(repetition, kind='stable')] = np.arange(_n) % _n_per_repetition
+    block = rank // _block_size + n_blocks_per_repetition * repetition
+    trial = rank % _block_size
+
+    # sort by block (and so repetition) and trial
+    by_trial = np.lexsort((trial, block))
+    row = by_observation[by_trial]
+    g = group(sub)
+    return {
+        'sub': np.full(_n, sub),
+        'repetition': factor['repetition'][row],
+        'direction': levels['direction'][g][factor['direction'][row]],
+        'hue': levels['hue'][g][factor['hue'][row]],
+        'chroma': np.asarray(options['chroma'])[factor['chroma'][row]],
+        'lightness': np.asarray(options['lightness'])[factor['lightness'][row]],
+        'shape': np.asarray(options['shape'])[factor['shape'][row]],
+        'group': np.full(_n, g),
+        'observation': observation[row],
+        'block': block[by_trial],
+        'trial': trial[by_trial]}
+
+
+def subject_design(sub: int, seed: int = seed) -> pd.DataFrame:
+    return pd.DataFrame(subject_arrays(sub, seed), columns=columns)
+
+
+def stream_designs(subs: Iterable[int], seed: int = seed, chunk: int = 100) -> Iterator[pd.DataFrame]:
+    """Designs of many subjects, `chunk` subjects at a time."""
+    subs = list(subs)
+    for start in range(0, len(subs), chunk):
+        arrays = [subject_arrays(sub, seed) for sub in subs[start:start + chunk]]
+        yield pd.DataFrame(
+            {c: np.concatenate([a[c] for a in arrays]) for c in columns},
+            columns=columns)
+
+
+def fit_gamut(d: pd.DataFrame, gamut, clip: bool = False) -> pd.DataFrame:
+    """The design, if a monitor (a gamut.GamutTable) can show all of its colors.
+
+    Raises ValueError listing the colors that it can not show, or, with clip, reduces
+    their chroma to the largest it can show.
+    """
+    lch = d[['lightness', 'chroma', 'hue']].to_numpy(dtype=float)
+    outside = ~gamut.in_gamut(lch)
+    if not outside.any():
+        return d
+    if not clip:
+        colors = d.loc[outside, ['lightness', 'chroma', 'hue']].drop_duplicates()
+        raise ValueError(f"{len(colors)} colors are outside of the monitor's gamut:\n{colors.to_string(index=False)}")
+    return d.assign(chroma=gamut.clip(lch)[:, 1])
+
+
+def audit(d: pd.DataFrame) -> pd.DataFrame:
+    """Number of trials in every subject x block x shape x level cell, for both factors.
+
+    Raises ValueError if any subject is missing (or repeats) a combination of direction,
+    hue and shape within a repetition, if the shape x level cells of a subject do not
+    all have the same number of trials, or if any block has the wrong number of trials.
+    Blocks are cut from each subject's shuffled order, so the cells of a block are not
+    balanced, only those of a subject.
+    """
+    sub_codes, sub = pd.factorize(d['sub'], sort=True)
+    shape_codes, shape = pd.factorize(d['shape'], sort=True)
+    n_subs, n_shapes = len(sub), len(shape)
+    n_blocks = len(options['repetition']) * n_blocks_per_repetition
+    block = d['block'].to_numpy()
+    repetition = d['repetition'].to_numpy()
+
+    # every combination of repetition x direction x hue x shape exactly once per subject
+    direction_codes, direction = pd.factorize(d['direction'], sort=True)
+    hue_codes, hue = pd.factorize(d['hue'], sort=True)
+    combination = np.ravel_multi_index(
+        (sub_codes, repetition, direction_codes, hue_codes, shape_codes),
+        (n_subs, len(options['repetition']), len(direction), len(hue), n_shapes))
+    if np.bincount(combination).max() > 1 or len(np.unique(combination)) != n_subs * _n:
+        raise ValueError('each subject must see every combination once per repetition')
+    block_sizes = np.bincount(sub_codes * n_blocks + block, minlength=n_subs * n_blocks)
+    if np.any(block_sizes != _block_size):
+        raise ValueError(f'every block must have {_block_size} trials')
 
-d['observation'] = d.groupby(['sub'])['direction'].transform(lambda x: sample(range(0, len(x)), len(x)))
-d = d.sort_values(by=['sub', 'observation'])
+    cells = []
+    for factor in ['direction', 'hue']:
+        level_codes, level = pd.factorize(d[factor], sort=True)
+        shape_ = (n_subs, n_blocks, n_shapes, len(level))
+        n = np.bincount(
+            np.ravel_multi_index((sub_codes, block, shape_codes, level_codes), shape_),
+            minlength=np.prod(shape_))
+        index = np.unravel_index(np.arange(n.size), shape_)
+        cells.append(pd.DataFrame({
+            'sub': sub[index[0]],
+            'block': index[1],
+            'shape': shape[index[2]],
+            'factor': factor,
+            'level': level[index[3]],
+            'n': n}))
+    cells = pd.concat(cells, ignore_index=True)
 
-d['block'] = d.groupby(['sub', 'repetition'])['chroma'].transform(lambda x: list(chain.from_iterable(repeat(y, len(x)//4) for y in range(0, 4))))
-d['block'] += ((1 + max(d.block.values)) * d.repetition)
+    # levels depend on the subject's group, so only those a subject has are counted
+    for factor in ['direction', 'hue']:
+        per_subject = d.groupby(['sub', 'shape', factor]).size()
+        n_cells = per_subject.groupby(level='sub').size()
+        if per_subject.nunique() != 1 or np.any(n_cells != n_shapes * len(levels[factor]['even'])):
+            raise ValueError(
+                f'every subject must have the same number of trials in every shape x {factor} cell, '
+                f'but they range from {per_subject.min()} to {per_subject.max()}')
+    return cells
 
-d['trial'] = d.groupby(['sub', 'block'])['direction'].transform(lambda x: range(0, len(x)))
-d['direction'] = np.where(
-    d.group=='even', 
-    [[-90, -60, -30, 0, 30, 60, 90][x] for x in d.direction],
-    [[-90, -30, -5, 0, 5, 30, 90][x] for x in d.direction])
-d['hue'] = np.where(
-    d.group=='even', 
-    [[0, 30, 60, 90, 120, 150, 180][x] for x in d.hue],
-    [[0, 60, 85, 90, 95, 120, 180][x] for x in d.hue])    
 
-d = d.sort_values(by=['sub', 'repetition', 'block', 'trial'])
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subs", help="number of subjects", type=int, default=40)
+    parser.add_argument("--seed", help="random seed", type=int, default=seed)
+    parser.add_argument("--out", help="csv file to write the design to", default=None)
+    parser.add_argument("--audit", help="check the balance of the design", action='store_true', default=False)
+    parser.add_argument("--gamut", help="check the colors against this monitor's gamut", choices=['default', 'calibrated'], default=None)
+    parser.add_argument("--clip", help="reduce the chroma of colors outside of the gamut, rather than stopping", action='store_true', default=False)
+    args = parser.parse_args()
 
+    gamut = None
+    if args.gamut:
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from calibration import asus_calibration
+        from gamut import calibrated_gamut, default_gamut
 
-# %%
-d.to_csv(
-    os.path.join(
-        git.Repo('.', search_parent_directories=True).working_tree_dir, 
-        'stimuli', 
-        'design.csv'), 
-    index=False, index_label=False)
+        gamut = calibrated_gamut(asus_calibration()) if args.gamut == 'calibrated' else default_gamut()
 
+    first = True
+    for d in stream_designs(range(0, args.subs), seed=args.seed):
+        if gamut is not None:
+            d = fit_gamut(d, gamut, args.clip)
+        if args.out:
+            d.to_csv(args.out, mode='w' if first else 'a', header=first, index=False)
+        if args.audit:
+            try:
+                cells = audit(d)
+            except ValueError as e:
+                raise SystemExit(f"subjects {d['sub'].min()}-{d['sub'].max()}: {e}")
+            print(
+                f"subjects {d['sub'].min()}-{d['sub'].max()}: "
+                f"trials per block x shape x level cell range from {cells['n'].min()} to {cells['n'].max()}")
+        first = False
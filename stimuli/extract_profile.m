@@ -9,9 +9,10 @@ clut.blue = icc.MatTRC.BlueTRC;
 writetable(clut, 'asus-clut.csv');
 
 
+% XYZ of each primary (one column per primary)
 rgb2xyz = table();
-rgb2xyz.red = icc.MatTRC.RedTRC;
-rgb2xyz.green = icc.MatTRC.GreenTRC;
-rgb2xyz.blue = icc.MatTRC.BlueTRC;
+rgb2xyz.red = icc.MatTRC.RedColorant';
+rgb2xyz.green = icc.MatTRC.GreenColorant';
+rgb2xyz.blue = icc.MatTRC.BlueColorant';
 
 writetable(rgb2xyz, 'asus-rgb2xyz.csv');
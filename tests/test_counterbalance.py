@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+import counterbalance
+
+
+def test_audit_generated_designs():
+    for d in counterbalance.stream_designs(range(0, 6), chunk=4):
+        cells = counterbalance.audit(d)
+        assert cells.groupby(['sub', 'block'])['n'].sum().nunique() == 1
+
+
+def test_audit_unbalanced_design():
+    d = counterbalance.subject_design(0)
+    # one trial shows another hue, so one hue is seen twice and another never
+    swapped = d.copy()
+    swapped.loc[0, 'hue'] = swapped['hue'][swapped['hue'] != d.loc[0, 'hue']].iloc[0]
+    with pytest.raises(ValueError):
+        counterbalance.audit(swapped)
+
+    # a trial moved to another block
+    moved = d.copy()
+    moved.loc[0, 'block'] = (moved.loc[0, 'block'] + 1) % moved['block'].nunique()
+    with pytest.raises(ValueError):
+        counterbalance.audit(moved)
+
+    with pytest.raises(ValueError):
+        counterbalance.audit(d.drop(index=np.arange(10)))
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import export
+from fliplog import FlipLog, category
+
+tables = pytest.importorskip('tables')
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+def write_datastore(path, records, messages):
+    """An hdf5 file laid out like an iohub datastore, with trial records (block,
+    trial) and experiment messages (category, text, time)."""
+    with tables.open_file(path, mode='w') as f:
+        cv = f.create_group('/data_collection', 'condition_variables', createparents=True)
+        f.create_table(cv, 'EXP_CV_1', np.array(records, dtype=[('block', '<i8'), ('trial', '<i8')]))
+        experiment = f.create_group('/data_collection/events', 'experiment', createparents=True)
+        f.create_table(experiment, 'MessageEvent', np.array(
+            messages, dtype=[('category', 'S32'), ('text', 'S128'), ('time', '<f8')]))
+
+
+def read_flips(out, name):
+    return pq.read_table(f'{out}/flips/session={name}').to_pandas()
+
+
+def test_fliplog_session(tmp_path):
+    records = [(0, 0), (0, 1), (1, 0), (1, 1)]
+    messages = []
+    log = FlipLog(10)
+    for block, trial in records:
+        for flip in range(3):
+            log.record(flip, 10 * block + trial + flip / 100)
+        messages.extend((category, text, 0.0) for text in log.encode(block, trial))
+        log.reset()
+    write_datastore(tmp_path / 'fliplog.hdf5', records, messages)
+
+    rows = export.export_session(str(tmp_path / 'fliplog.hdf5'), str(tmp_path / 'out'))
+    assert rows['flips'] == 12
+    flips = read_flips(tmp_path / 'out', 'fliplog')
+    assert flips[['block', 'trial']].drop_duplicates().apply(tuple, axis=1).tolist() == records
+    assert np.allclose(flips['time'], 10 * flips['block'] + flips['trial'] + flips['flip'] / 100)
+
+
+def test_legacy_session(tmp_path):
+    # trials restart in every block; the last trial of the session has no record
+    records = [(0, 0), (0, 1), (1, 0), (1, 1)]
+    run = records + [(2, 0)]
+    messages = [
+        ('flip', f'trial-{trial}_flip-{flip}', 10 * block + trial + flip / 100)
+        for block, trial in run for flip in range(3)]
+    write_datastore(tmp_path / 'legacy.hdf5', records, messages)
+
+    rows = export.export_session(str(tmp_path / 'legacy.hdf5'), str(tmp_path / 'out'))
+    assert rows['flips'] == 15
+    flips = read_flips(tmp_path / 'out', 'legacy')
+    expected = [(block, trial) for block, trial in records] + [(-1, 0)]
+    assert flips[['block', 'trial']].drop_duplicates().apply(tuple, axis=1).tolist() == expected
+    matched = flips['block'] >= 0
+    assert np.allclose(
+        flips['time'][matched],
+        10 * flips['block'][matched] + flips['trial'][matched] + flips['flip'][matched] / 100)
+    assert not flips.duplicated(['block', 'trial', 'flip'])[matched].any()
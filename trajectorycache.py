@@ -0,0 +1,149 @@
+"""Every trial's dot positions for a subject's session, computed ahead of the session.
+
+A trial's dots follow from its direction, the dots' parameters (number, speed,
+field size, refresh rate) and a seed, so the whole session can be generated before
+it starts. This writes them, on a pool of processes, to
+
+    data-raw/sub-{sub}_trajectories.npy   trials x flips x dots x 2, float32, deg
+    data-raw/sub-{sub}_trajectories.json  block, trial, direction and dots_seed of
+                                          each trial, and the dots' parameters
+
+in the order the session presents the trials. When the files exist, the session
+takes its dots_seed from them, and plays each trial's dots straight from the
+memory-mapped file (see WrappedDot.playTrajectory) instead of moving them itself.
+The exact stimuli are then also archived with the session's data.
+
+example:
+    python trajectorycache.py --sub 3
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from designstore import DesignStore, build, is_current
+from main import Experiment
+from replay import trajectory
+
+directory = 'data-raw'
+
+
+def params(experiment=Experiment) -> Dict:
+    """Parameters of the dots that the trajectories depend on."""
+    return {
+        'ndots': experiment.ndots,
+        'dot_speed_deg_per_sec': experiment.dot_speed_deg_per_sec,
+        'dotfield_diameter_deg': experiment.dotfield_diameter_deg,
+        'dot_coherence': experiment.dot_coherence,
+        'refresh_rate': experiment.refresh_rate,
+        'n_flips_per_dots': experiment.n_flips_per_dots}
+
+
+def paths(sub: int, directory: str = directory):
+    prefix = os.path.join(directory, f'sub-{sub}_trajectories')
+    return prefix + '.npy', prefix + '.json'
+
+
+def session_trials(sub: int, design: str, store: str) -> pd.DataFrame:
+    """A subject's trials, in the order the session presents them."""
+    if not is_current(store, design):
+        build([design], store)
+    return DesignStore(store).subject(sub).sort_values(by=['block', 'trial'])
+
+
+def _fill(path: str, first: int, seeds: List[int], directions: List[float]) -> None:
+    trajectories = np.load(path, mmap_mode='r+')
+    for i, (seed, direction) in enumerate(zip(seeds, directions)):
+        trajectories[first + i] = trajectory(seed, direction, trajectories.shape[1])
+    trajectories.flush()
+
+
+def precompute(
+    sub: int,
+    design: str = os.path.join('stimuli', 'design.csv'),
+    store: str = os.path.join('stimuli', 'design-store'),
+    directory: str = directory,
+    seed: Optional[int] = None,
+    jobs: Optional[int] = None,
+    chunk: int = 16) -> str:
+    """Write a subject's trajectories; returns the path of the array."""
+    trials = session_trials(sub, design, store)
+    seeds = np.random.default_rng(seed).integers(2**31, size=len(trials))
+    directions = trials['direction'].to_numpy(dtype=float)
+    p = params()
+    npy, index = paths(sub, directory)
+
+    os.makedirs(directory, exist_ok=True)
+    # the index is written last, so a cache that was not finished is never used
+    if os.path.exists(index):
+        os.remove(index)
+    trajectories = np.lib.format.open_memmap(
+        npy, mode='w+', dtype=np.float32,
+        shape=(len(trials), p['n_flips_per_dots'], p['ndots'], 2))
+    del trajectories
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [
+            pool.submit(_fill, npy, first, seeds[first:first + chunk].tolist(), directions[first:first + chunk].tolist())
+            for first in range(0, len(trials), chunk)]
+        for future in futures:
+            future.result()
+
+    with open(index + '.tmp', 'w') as f:
+        json.dump({
+            'params': p,
+            'block': trials['block'].tolist(),
+            'trial': trials['trial'].tolist(),
+            'direction': directions.tolist(),
+            'dots_seed': seeds.tolist()}, f)
+    os.replace(index + '.tmp', index)
+    return npy
+
+
+class TrajectoryCache(object):
+    """A subject's precomputed trajectories, memory-mapped."""
+
+    def __init__(self, sub: int, directory: str = directory):
+        npy, index = paths(sub, directory)
+        with open(index) as f:
+            self.index = json.load(f)
+        if self.index['params'] != params():
+            raise ValueError(f'{npy} was made for other dots ({self.index["params"]}), precompute it again')
+        self.dots_seed = np.array(self.index['dots_seed'], dtype=np.int64)
+        self.trajectories = np.load(npy, mmap_mode='r')
+
+
+    def check(self, trialdf: pd.DataFrame) -> None:
+        """Raise if the cached trials are not the trials of trialdf, in its order."""
+        for column in ('block', 'trial', 'direction'):
+            if not np.array_equal(np.asarray(self.index[column]), trialdf[column].to_numpy()):
+                raise ValueError(f'trajectories do not match the design ({column}), precompute them again')
+
+
+    def trial(self, i: int) -> np.ndarray:
+        """Positions on each flip of the ith trial, a view onto the file."""
+        return self.trajectories[i]
+
+
+def load(sub: int, directory: str = directory) -> Optional[TrajectoryCache]:
+    """The subject's trajectories, or None if they were not precomputed."""
+    if not os.path.exists(paths(sub, directory)[1]):
+        return None
+    return TrajectoryCache(sub, directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sub", help="subject number", type=int, required=True)
+    parser.add_argument("--seed", help="seed of the trials' seeds (default: fresh entropy)", type=int, default=None)
+    parser.add_argument("-o", "--out", help="directory to write to", default=directory)
+    parser.add_argument("-j", "--jobs", help="number of processes (default: one per cpu)", type=int, default=None)
+    args = parser.parse_args()
+
+    npy = precompute(args.sub, directory=args.out, seed=args.seed, jobs=args.jobs)
+    print(f'{npy}: {os.path.getsize(npy) / 2**20:.0f} MiB')
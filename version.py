@@ -0,0 +1,96 @@
+"""Commit of the experiment's code, stored with every session.
+
+The commit is worked out once, when the experiment is installed (or updated), by
+running this module, which writes it to the VERSION file. Sessions read that file, so
+launching does not depend on how the copy was made (a clone, a worktree or submodule,
+or an export without .git). Without it, e.g. in a fresh checkout, the commit is read
+from git instead.
+
+The commit is read straight from the git directory (HEAD, then the ref it points to,
+loose or packed) rather than through GitPython or a git process.
+
+example:
+    python version.py  # write VERSION, after installing or updating
+"""
+
+import os
+from typing import Optional
+
+root = os.path.dirname(os.path.abspath(__file__))
+version_file = os.path.join(root, 'VERSION')
+n_chars = 6
+
+
+def git_dir(path: str = os.path.join(root, '.git')) -> Optional[str]:
+    """The git directory of a checkout's .git, which is a file pointing to it in a
+    worktree or submodule."""
+    if os.path.isdir(path):
+        return path
+    try:
+        with open(path) as f:
+            line = f.read().strip()
+    except OSError:
+        return None
+    if not line.startswith('gitdir: '):
+        return None
+    return os.path.join(os.path.dirname(path), line[len('gitdir: '):])
+
+
+def read_git(git_dir: str) -> Optional[str]:
+    """Commit checked out in git_dir, or None if it can not be found."""
+    try:
+        with open(os.path.join(git_dir, 'HEAD')) as f:
+            head = f.read().strip()
+    except OSError:
+        return None
+    if not head.startswith('ref: '):
+        # detached
+        return head
+    ref = head[len('ref: '):]
+    # a worktree's branches are kept in the main repository's git directory
+    dirs = [git_dir]
+    try:
+        with open(os.path.join(git_dir, 'commondir')) as f:
+            dirs.append(os.path.join(git_dir, f.read().strip()))
+    except OSError:
+        pass
+    for d in dirs:
+        try:
+            with open(os.path.join(d, ref)) as f:
+                return f.read().strip()
+        except OSError:
+            pass
+        try:
+            with open(os.path.join(d, 'packed-refs')) as f:
+                for line in f:
+                    commit, _, name = line.strip().partition(' ')
+                    if name == ref:
+                        return commit
+        except OSError:
+            pass
+    return None
+
+
+def version() -> str:
+    try:
+        with open(version_file) as f:
+            commit = f.read().strip()
+    except OSError as e:
+        # e.g. a checkout where version.py has not been run yet
+        directory = git_dir()
+        commit = None if directory is None else read_git(directory)
+        if commit is None:
+            raise RuntimeError(
+                f'{version_file} can not be read ({e.strerror}) and this is not a git checkout, '
+                f'run "python version.py" after installing or updating the experiment') from e
+    return commit[0:n_chars]
+
+
+if __name__ == "__main__":
+    directory = git_dir()
+    commit = None if directory is None else read_git(directory)
+    if commit is None:
+        raise SystemExit('not a git checkout, so the version can not be worked out')
+    with open(version_file, 'w') as f:
+        f.write(commit + '\n')
+    print(f'{version_file}: {commit}')